@@ -0,0 +1,729 @@
+#!/usr/bin/env python3
+"""
+Headless HTTP/JSON API for the review engine
+
+Gives pipeline tools (SOAR jobs, CI checks on detection repos) the app's
+core operations without clicking through the Streamlit page. It uses the
+same modules as the app - LLM client and response cache, catalog, review
+and draft stores - so a review saved here shows up as reviewed in the app
+and the other way round.
+
+    python api_server.py --port 8080          (needs starlette and uvicorn)
+
+    GET  /health                          load and queue figures
+    GET  /usecases?status=&q=&page=&page_size=&order=name|lint
+    GET  /usecases/{name}                 techniques, review status and lint findings
+    POST /usecases/{name}/analyses        {"mode": "sync" | "stream" | "queued", "prompt": "...",
+                                           "structured": false, "fanout": false, "rereview": false}
+    GET  /jobs/{id}                       state and result of a queued analysis
+    GET  /conversations/{id}
+    POST /conversations/{id}/followups    {"question": "...", "stream": false}
+    POST /conversations/{id}/review       {"final_review": "..."} saves and marks reviewed
+
+Errors are {"error": message}. At most MAX_CONCURRENT analyses and
+follow-ups run at once; a sync or streamed request that gets no slot within
+ADMISSION_WAIT seconds is answered 429 with Retry-After. Queued analyses
+wait in a bounded queue (503 when full) drained by JOB_WORKERS, which use the
+same slots. Streamed replies are server-sent events: "delta" events with
+text, then "done" (the result) or "error". A caller that disconnects
+cancels its LLM requests.
+
+Conversations live in this process (the oldest beyond MAX_CONVERSATIONS are
+dropped), so run a single worker process per port.
+"""
+
+import os
+import hmac
+import math
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+import contextlib
+from collections import OrderedDict
+
+try:
+    from starlette.applications import Starlette
+    from starlette.responses import Response, StreamingResponse
+    from starlette.routing import Route
+except ImportError:
+    Starlette = None  # optional; only this service needs it
+
+import catalog
+import prompts
+import fanout
+import rereview
+import llm_client
+import review_store
+import serializers
+import session_manager
+import spl_lint
+import usecase_index
+import generation_policy
+import structured_output
+
+CATALOG_PATH = os.getenv("USECASE_CATALOG", catalog.DEFAULT_CATALOG_PATH)
+API_TOKEN = os.getenv("USECASE_API_TOKEN")
+MAX_CONCURRENT = int(os.getenv("USECASE_API_MAX_CONCURRENT", 8))
+ADMISSION_WAIT = float(os.getenv("USECASE_API_ADMISSION_WAIT", 2))
+QUEUE_SIZE = int(os.getenv("USECASE_API_QUEUE_SIZE", 100))
+JOB_WORKERS = int(os.getenv("USECASE_API_JOB_WORKERS", 2))
+MAX_CONVERSATIONS = int(os.getenv("USECASE_API_MAX_CONVERSATIONS", 1000))
+MAX_JOBS = 1000  # finished jobs kept for polling
+MAX_PAGE_SIZE = 500
+POLL_INTERVAL = 0.5
+MODES = ("sync", "stream", "queued")
+
+
+class APIError(Exception):
+    """Answered as {"error": message} with an HTTP status"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+if Starlette is not None:
+    class EventStream(StreamingResponse):
+        """Server-sent events response that runs close() when sending ends, even if cancelled"""
+
+        def __init__(self, events, close):
+            super().__init__(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+            self._close = close
+
+        async def __call__(self, scope, receive, send):
+            try:
+                await super().__call__(scope, receive, send)
+            finally:
+                self._close()
+
+
+def json_response(payload, status=200, headers=None):
+    return Response(serializers.dumps(payload), status, headers, media_type="application/json")
+
+
+def sse_event(event, payload):
+    return b"event: " + event.encode() + b"\ndata: " + serializers.dumps(payload) + b"\n\n"
+
+
+def new_usage():
+    return {"model": "", "prompt_tokens": 0, "completion_tokens": 0, "latency_ms": 0.0, "llm_calls": 0}
+
+
+def add_usage(usage, calls, latency_ms=None):
+    """Accumulate LLMResults into a usage dict like the app's; latency_ms overrides their sum"""
+    for result in calls:
+        usage["model"] = result.model
+        usage["prompt_tokens"] += result.prompt_tokens
+        usage["completion_tokens"] += result.completion_tokens
+        usage["llm_calls"] += 1
+    if latency_ms is None:
+        latency_ms = sum(result.latency_ms for result in calls)
+    usage["latency_ms"] = round(usage["latency_ms"] + latency_ms, 1)
+    return usage
+
+
+class Admission:
+    """Bounded concurrency for LLM work; callers wait briefly for a slot, then get 429"""
+
+    def __init__(self, limit=MAX_CONCURRENT, wait=ADMISSION_WAIT):
+        self.limit = limit
+        self.wait = wait
+        self.active = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self, block=False):
+        if block:
+            await self._semaphore.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise APIError(429, "Too many concurrent requests", retry_after=max(1, math.ceil(self.wait)))
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, block=False):
+        await self.acquire(block)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class Jobs:
+    """Bounded queue of analyses run by background workers, with their states for polling"""
+
+    def __init__(self, size=QUEUE_SIZE, workers=JOB_WORKERS, limit=MAX_JOBS):
+        self.queue = asyncio.Queue(size)
+        self.workers = workers
+        self.limit = limit
+        self.rejected = 0
+        self._jobs = OrderedDict()
+        # Running mean of job durations, for Retry-After when the queue is full
+        self._mean_seconds = 30.0
+
+    def submit(self, work):
+        """Queue `work()` (a coroutine function returning the result); returns the job record"""
+        job = {"id": uuid.uuid4().hex, "status": "queued", "created": time.time()}
+        try:
+            self.queue.put_nowait((job, work))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            wait = self.queue.qsize() / max(1, self.workers) * self._mean_seconds
+            raise APIError(503, "Analysis queue is full", retry_after=max(1, math.ceil(wait)))
+        self._jobs[job["id"]] = job
+        finished = [job_id for job_id, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - self.limit)]:
+            del self._jobs[job_id]
+        return job
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise APIError(404, "Unknown or expired job")
+        return job
+
+    async def worker(self):
+        while True:
+            job, work = await self.queue.get()
+            job["status"] = "running"
+            start = time.monotonic()
+            try:
+                job["result"] = await work()
+                job["status"] = "done"
+            except (APIError, llm_client.LLMError) as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = f"Internal error: {e}"
+            finally:
+                job["finished"] = time.time()
+                self._mean_seconds = 0.8 * self._mean_seconds + 0.2 * (time.monotonic() - start)
+                self.queue.task_done()
+
+
+class Conversations:
+    """Analysis conversations in session_manager's state layout, least recently used dropped first"""
+
+    def __init__(self, limit=MAX_CONVERSATIONS):
+        self.limit = limit
+        self._states = OrderedDict()
+
+    def __len__(self):
+        return len(self._states)
+
+    def create(self, usecase_name, outcome):
+        state = {}
+        session_manager.init(state)
+        session_manager.start(state, usecase_name, outcome["analysis"], outcome["prompt"], outcome["meta"])
+        state["analysis_usage"] = outcome["usage"]
+        state["current_structured"] = outcome["structured"]
+        state["busy"] = False
+        self._states[state["session_id"]] = state
+        while len(self._states) > self.limit:
+            _, dropped = self._states.popitem(last=False)
+            if dropped["archived_turns"]:
+                asyncio.get_running_loop().run_in_executor(
+                    None, review_store.delete_draft, dropped["session_id"], dropped["current_usecase"]
+                )
+        return state
+
+    def get(self, conversation_id):
+        state = self._states.get(conversation_id)
+        if state is None:
+            raise APIError(404, "Unknown or expired conversation; request a new analysis")
+        self._states.move_to_end(conversation_id)
+        return state
+
+    def remove(self, conversation_id):
+        self._states.pop(conversation_id, None)
+
+
+def conversation_payload(state, include_history=True):
+    payload = {
+        "conversation_id": state["session_id"],
+        "usecase": state["current_usecase"],
+        "analysis": state["conversation_history"][0]["content"] if state["conversation_history"] else "",
+        "structured": state["current_structured"],
+        "meta": state["analysis_meta"],
+        "usage": state["analysis_usage"],
+        "archived_messages": state["archived_turns"]
+    }
+    if include_history:
+        payload["history"] = state["conversation_history"]
+    return payload
+
+
+def analyze(scope, techniques, entry, record, options):
+    """Run one analysis in the calling thread; returns the outcome dict used for conversations"""
+    config = llm_client.get_config()
+    complete = lambda messages, **params: scope.complete(config, messages, **params)
+    start = time.perf_counter()
+    document = None
+
+    def on_wait():
+        if scope.cancelled:
+            raise llm_client.LLMCancelled("API request cancelled")
+
+    if options["rereview"]:
+        try:
+            markdown, prompt, result = rereview.run_rereview(complete, techniques, entry, record)
+        except ValueError as e:
+            raise APIError(409, str(e))
+        meta = {"mode": "rereview", "base_version": record.get("version", 1)}
+        calls = [result]
+    else:
+        prompt = options["prompt"] or prompts.build_default_prompt(techniques, entry)
+        meta = {"mode": "full"}
+        if options["fanout"] and len(techniques) > 1:
+            markdown, document, calls, _ = fanout.run_fanout_analysis(
+                complete, techniques, entry, options["structured"], on_wait=on_wait
+            )
+        elif options["structured"]:
+            document, calls = structured_output.run_structured_analysis(complete, techniques, entry, prompt)
+            markdown = structured_output.render_markdown(document, techniques)
+        else:
+            result = generation_policy.run(
+                complete, prompts.build_analysis_messages(prompt), generation_policy.ANALYSIS, len(techniques)
+            )
+            markdown, calls = result.content, [result]
+    return {
+        "analysis": markdown,
+        "prompt": prompt,
+        "meta": meta,
+        "structured": document,
+        "usage": add_usage(new_usage(), calls, (time.perf_counter() - start) * 1000)
+    }
+
+
+def save_review(state, final_review, catalog_path):
+    """Save a conversation as the use case's next analysis version and mark it reviewed"""
+    usecase_name = state["current_usecase"]
+    _, usecases = catalog.get_catalog(catalog_path)
+    entry = usecases.get(usecase_name, {})
+    full_conversation = prompts.format_conversation(session_manager.full_history(state), final_review)
+    metadata = dict(state["analysis_usage"])
+    metadata.update(state["analysis_meta"])
+    if state["current_structured"]:
+        metadata["structured"] = state["current_structured"]
+    version = review_store.save_analysis(
+        usecase_name, full_conversation, catalog.content_hash(entry), metadata, rereview.snapshot(entry)
+    )
+    review_store.mark_reviewed(usecase_name)
+    session_manager.finish(state, usecase_name)
+    return version
+
+
+class Service:
+    """Shared state of one API process"""
+
+    def __init__(self, catalog_path=CATALOG_PATH, max_concurrent=MAX_CONCURRENT, queue_size=QUEUE_SIZE,
+                 job_workers=JOB_WORKERS, token=API_TOKEN):
+        self.catalog_path = catalog_path
+        self.token = token
+        self.admission = Admission(max_concurrent)
+        self.jobs = Jobs(queue_size, job_workers)
+        self.conversations = Conversations()
+
+    async def catalog(self):
+        try:
+            return await asyncio.to_thread(catalog.get_catalog, self.catalog_path)
+        except (FileNotFoundError,) + serializers.decode_errors() as e:
+            raise APIError(503, f"Error loading data: {e}")
+
+    async def usecase(self, name):
+        table, usecases = await self.catalog()
+        entry = usecases.get(name)
+        if entry is None:
+            raise APIError(404, f"Unknown use case {name!r}")
+        return table, usecases, entry
+
+    async def review_state(self):
+        """(reviewed set, review hashes) shared with the app's stores"""
+        return await asyncio.to_thread(
+            lambda: (review_store.reviewed_snapshot(), review_store.load_review_hashes())
+        )
+
+    async def run_blocking(self, request, scope, func, *args):
+        """Run func in a worker thread; cancels scope's LLM requests if the caller goes away"""
+        future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=POLL_INTERVAL)
+                if done:
+                    return future.result()
+                if request is not None and await request.is_disconnected():
+                    raise APIError(499, "Client disconnected")
+        except (APIError, asyncio.CancelledError):
+            scope.cancel()
+            # The thread ends with LLMCancelled that nobody reads
+            future.add_done_callback(lambda f: f.exception())
+            raise
+
+    async def stream_reply(self, messages, task, technique_count, question, finish, on_close=None):
+        """Server-sent events for one streamed completion
+
+        `await finish(result)` gives the "done" payload; `on_close()` runs once
+        the response ends, however it ends.
+        """
+        await self.admission.acquire()
+        cancel = threading.Event()
+
+        def close():
+            # Also reached when the caller disconnects mid-stream
+            cancel.set()
+            self.admission.release()
+            if on_close is not None:
+                on_close()
+
+        try:
+            config = llm_client.get_config()
+            policy = generation_policy.get_policy()
+            limits = policy.limits(task, technique_count, question)
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue()
+
+            def produce():
+                try:
+                    for item in llm_client.stream(config, messages, cancel_event=cancel, **limits):
+                        loop.call_soon_threadsafe(queue.put_nowait, item)
+                except llm_client.LLMError as e:
+                    loop.call_soon_threadsafe(queue.put_nowait, e)
+                finally:
+                    loop.call_soon_threadsafe(queue.put_nowait, None)
+
+            loop.run_in_executor(None, produce)
+        except BaseException:
+            close()
+            raise
+
+        async def events():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if isinstance(item, str):
+                    yield sse_event("delta", {"text": item})
+                elif isinstance(item, llm_client.LLMError):
+                    yield sse_event("error", {"error": str(item)})
+                else:
+                    policy.observe(task, item, technique_count)
+                    yield sse_event("done", await finish(item))
+
+        return EventStream(events(), close)
+
+    def stats(self):
+        return {
+            "active": self.admission.active,
+            "max_concurrent": self.admission.limit,
+            "rejected": self.admission.rejected,
+            "queued": self.jobs.queue.qsize(),
+            "queue_size": self.jobs.queue.maxsize,
+            "queue_rejected": self.jobs.rejected,
+            "conversations": len(self.conversations)
+        }
+
+
+def token_matches(authorization, token):
+    """Constant-time check of an Authorization header against the bearer token"""
+    return hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
+
+def endpoint(func):
+    """Route wrapper: bearer token check and error responses"""
+    async def wrapper(request):
+        service = request.app.state.service
+        if service.token and not token_matches(request.headers.get("authorization", ""), service.token):
+            return json_response({"error": "Missing or invalid bearer token"}, 401)
+        try:
+            return await func(request, service)
+        except APIError as e:
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+            return json_response({"error": str(e)}, e.status, headers)
+        except llm_client.LLMError as e:
+            return json_response({"error": str(e)}, 502)
+    return wrapper
+
+
+async def read_json(request):
+    body = await request.body()
+    if not body.strip():
+        return {}
+    try:
+        data = serializers.loads(body)
+    except serializers.decode_errors() as e:
+        raise APIError(400, f"Invalid JSON body: {e}")
+    if not isinstance(data, dict):
+        raise APIError(400, "JSON body must be an object")
+    return data
+
+
+def int_param(request, name, default, low=1, high=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise APIError(400, f"{name} must be an integer")
+    return max(low, min(value, high) if high else value)
+
+
+def require_config():
+    if not llm_client.get_config():
+        raise APIError(503, "Missing DATABRICKS_TOKEN or DATABRICKS_HOST environment variables")
+
+
+@endpoint
+async def health(request, service):
+    return json_response(dict(service.stats(), status="ok"))
+
+
+@endpoint
+async def list_usecases(request, service):
+    status = request.query_params.get("status", usecase_index.ALL)
+    if status not in usecase_index.STATUS_FILTERS:
+        raise APIError(400, f"status must be one of {', '.join(usecase_index.STATUS_FILTERS)}")
+    page = int_param(request, "page", 1)
+    page_size = int_param(request, "page_size", 50, high=MAX_PAGE_SIZE)
+    order = request.query_params.get("order", "name")
+    if order not in ("name", "lint"):
+        raise APIError(400, "order must be one of name, lint")
+    _, usecases = await service.catalog()
+    index = usecase_index.get_index(usecases)
+    reviewed, review_hashes = await service.review_state()
+    names = index.filter(status, reviewed, review_hashes, request.query_params.get("q", ""))
+    lint = None
+    if order == "lint":
+        # Lint review order: structurally broken use cases dropped, most findings first
+        lint = await asyncio.to_thread(spl_lint.lint_index)
+        if lint is None:
+            raise APIError(409, "No lint index; run spl_lint.py first")
+        names = spl_lint.review_order(names, lint)
+    items, page_count = usecase_index.paginate(names, page, page_size)
+    payload = {
+        "total": len(names),
+        "page": min(page, page_count),
+        "page_count": page_count,
+        "counts": index.counts(reviewed, review_hashes),
+        "items": [{"name": name, "status": index.status(name, reviewed, review_hashes)} for name in items]
+    }
+    if lint is not None:
+        severities = lint["severities"]
+        for item in payload["items"]:
+            item["lint"] = dict(zip(severities, lint["counts"].get(item["name"], [0] * len(severities))))
+    return json_response(payload)
+
+
+@endpoint
+async def get_usecase(request, service):
+    name = request.path_params["name"]
+    table, usecases, entry = await service.usecase(name)
+    reviewed, review_hashes = await service.review_state()
+    record = await asyncio.to_thread(review_store.load_analysis, name) or {}
+    findings = await asyncio.to_thread(spl_lint.findings_for, name, entry, table)
+    return json_response({
+        "name": name,
+        "status": usecase_index.get_index(usecases).status(name, reviewed, review_hashes),
+        "techniques": [t.to_dict() for t in table.resolve(entry.get("techniques", ()))],
+        "content_hash": catalog.content_hash(entry),
+        "lint": findings,
+        "review": {
+            "version": record.get("version"),
+            "timestamp": record.get("timestamp"),
+            "content_hash": record.get("content_hash")
+        } if record else None
+    })
+
+
+@endpoint
+async def create_analysis(request, service):
+    name = request.path_params["name"]
+    table, _, entry = await service.usecase(name)
+    body = await read_json(request)
+    mode = body.get("mode", "sync")
+    if mode not in MODES:
+        raise APIError(400, f"mode must be one of {', '.join(MODES)}")
+    options = {
+        "prompt": body.get("prompt") or None,
+        "structured": bool(body.get("structured")),
+        "fanout": bool(body.get("fanout")),
+        "rereview": bool(body.get("rereview"))
+    }
+    require_config()
+    techniques = table.resolve(entry.get("techniques", ()))
+    record = await asyncio.to_thread(review_store.load_analysis, name) if options["rereview"] else None
+
+    async def run(request=None, block=False):
+        scope = llm_client.CancelScope(name)
+        async with service.admission.slot(block):
+            outcome = await service.run_blocking(request, scope, analyze, scope, techniques, entry, record, options)
+        return conversation_payload(service.conversations.create(name, outcome), include_history=False)
+
+    if mode == "queued":
+        job = service.jobs.submit(lambda: run(block=True))
+        return json_response(
+            {"job_id": job["id"], "status": job["status"], "status_url": f"/jobs/{job['id']}"}, 202,
+            {"Location": f"/jobs/{job['id']}"}
+        )
+    if mode == "sync":
+        return json_response(await run(request))
+
+    if options["structured"] or options["fanout"] or options["rereview"]:
+        raise APIError(400, "Streaming is only available for free-form analyses")
+    prompt = options["prompt"] or prompts.build_default_prompt(techniques, entry)
+    start = time.perf_counter()
+
+    async def finish(result):
+        outcome = {
+            "analysis": result.content,
+            "prompt": prompt,
+            "meta": {"mode": "full"},
+            "structured": None,
+            "usage": add_usage(new_usage(), [result], (time.perf_counter() - start) * 1000)
+        }
+        return conversation_payload(service.conversations.create(name, outcome), include_history=False)
+
+    return await service.stream_reply(
+        prompts.build_analysis_messages(prompt), generation_policy.ANALYSIS, len(techniques), "", finish
+    )
+
+
+@endpoint
+async def get_job(request, service):
+    return json_response(service.jobs.get(request.path_params["job_id"]))
+
+
+@endpoint
+async def get_conversation(request, service):
+    return json_response(conversation_payload(service.conversations.get(request.path_params["conversation_id"])))
+
+
+def claim(state):
+    """Mark a conversation busy; one follow-up or save at a time"""
+    if state["busy"]:
+        raise APIError(409, "Another request for this conversation is in progress")
+    state["busy"] = True
+
+
+@endpoint
+async def add_followup(request, service):
+    state = service.conversations.get(request.path_params["conversation_id"])
+    body = await read_json(request)
+    question = (body.get("question") or "").strip()
+    if not question:
+        raise APIError(400, "question is required")
+    require_config()
+    claim(state)
+    history = state["conversation_history"]
+    history.append({"role": "user", "content": question})
+    messages = prompts.build_followup_messages(history, state["analysis_prompt"])
+
+    async def finish(result):
+        history.append({"role": "assistant", "content": result.content})
+        add_usage(state["analysis_usage"], [result])
+        # Keep long conversations bounded; the oldest turns move to the draft store
+        await asyncio.to_thread(session_manager.trim, state)
+        return {"conversation_id": state["session_id"], "answer": result.content, "usage": state["analysis_usage"]}
+
+    def release():
+        # A stream that ended without a reply leaves the question unanswered
+        if history and history[-1]["role"] == "user":
+            history.pop()
+        state["busy"] = False
+
+    if body.get("stream"):
+        try:
+            return await service.stream_reply(
+                messages, generation_policy.FOLLOWUP, 1, question, finish, on_close=release
+            )
+        except BaseException:
+            release()
+            raise
+
+    scope = llm_client.CancelScope(state["current_usecase"])
+    config = llm_client.get_config()
+    complete = lambda msgs, **params: scope.complete(config, msgs, **params)
+    try:
+        async with service.admission.slot():
+            result = await service.run_blocking(
+                request, scope, generation_policy.run, complete, messages, generation_policy.FOLLOWUP, 1, question
+            )
+        return json_response(await finish(result))
+    finally:
+        release()
+
+
+@endpoint
+async def review(request, service):
+    conversation_id = request.path_params["conversation_id"]
+    state = service.conversations.get(conversation_id)
+    body = await read_json(request)
+    claim(state)
+    try:
+        version = await asyncio.to_thread(save_review, state, body.get("final_review", ""), service.catalog_path)
+    except OSError as e:
+        raise APIError(500, f"Error saving analysis: {e}")
+    finally:
+        state["busy"] = False
+    service.conversations.remove(conversation_id)
+    return json_response({"usecase": state["current_usecase"], "version": version, "status": usecase_index.REVIEWED})
+
+
+def create_app(service=None):
+    """Starlette application around a Service"""
+    if Starlette is None:
+        raise SystemExit("❌ The API service needs starlette and uvicorn: pip install starlette uvicorn")
+    service = service or Service()
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        workers = [asyncio.create_task(service.jobs.worker()) for _ in range(service.jobs.workers)]
+        try:
+            yield
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    app = Starlette(routes=[
+        Route("/health", health),
+        Route("/usecases", list_usecases),
+        Route("/usecases/{name:path}/analyses", create_analysis, methods=["POST"]),
+        Route("/usecases/{name:path}", get_usecase),
+        Route("/jobs/{job_id}", get_job),
+        Route("/conversations/{conversation_id}", get_conversation),
+        Route("/conversations/{conversation_id}/followups", add_followup, methods=["POST"]),
+        Route("/conversations/{conversation_id}/review", review, methods=["POST"])
+    ], lifespan=lifespan)
+    app.state.service = service
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the review engine as an HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="Catalog to serve")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT, help="Analyses/follow-ups at once")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Queued analyses before 503")
+    parser.add_argument("--job-workers", type=int, default=JOB_WORKERS, help="Workers draining the queue")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("❌ The API service needs starlette and uvicorn: pip install starlette uvicorn")
+    app = create_app(Service(args.catalog, args.max_concurrent, args.queue_size, args.job_workers))
+    print(f"✅ Serving {args.catalog} on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmark - prompt building, LLM round trip, parsing and persistence
+
+Replays a recorded cassette (see cassette.py) so every run sees the same
+replies and, with --latency-scale 0, no endpoint time at all: what is left
+is the app's own work per analysis, which can be compared across commits on
+a machine with no network.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline against a cassette")
+    parser.add_argument("cassette", help="Recorded cassette to replay")
+    parser.add_argument("--catalog", default="mitre_enriched_with_files.json", help="Catalog to analyze")
+    parser.add_argument("--usecases", type=int, help="Use a synthetic catalog of this size instead")
+    parser.add_argument("--rounds", type=int, default=20, help="Passes over the use cases")
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="Cassette timing multiplier")
+    args = parser.parse_args()
+
+    # Configure the client before it is imported anywhere
+    os.environ.update({
+        "LLM_CASSETTE": os.path.abspath(args.cassette),
+        "LLM_CASSETTE_MODE": "replay",
+        "LLM_CASSETTE_LATENCY_SCALE": str(args.latency_scale),
+        "USECASE_CACHE_URL": "none"
+    })
+
+    import prompts
+    import llm_client
+    import review_store
+    import rereview
+    import export_analyses
+    from catalog import content_hash, load_catalog, normalize_catalog
+
+    if args.usecases:
+        from bench_serialization import synthetic_catalog
+        table, usecases = normalize_catalog(synthetic_catalog(args.usecases))
+    else:
+        table, usecases = load_catalog(args.catalog)
+    config = llm_client.get_config()
+    stages = {"prompt": [], "llm": [], "parse": [], "persist": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        analyses_path = os.path.join(tmp, "analyses.json")
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for name, entry in usecases.items():
+                techniques = table.resolve(entry.get("techniques", ()))
+                if not techniques:
+                    continue
+                t0 = time.perf_counter()
+                messages = prompts.build_analysis_messages(prompts.build_default_prompt(techniques, entry))
+                t1 = time.perf_counter()
+                result = llm_client.complete(config, messages, use_cache=False)
+                t2 = time.perf_counter()
+                sections = export_analyses.split_technique_sections(result.content, [t.ID for t in techniques])
+                summaries = [export_analyses.summarize_section(section) for section in sections.values()]
+                t3 = time.perf_counter()
+                # Same record shape as a review saved from the app
+                usage = {
+                    "model": result.model,
+                    "prompt_tokens": result.prompt_tokens,
+                    "completion_tokens": result.completion_tokens,
+                    "latency_ms": result.latency_ms,
+                    "llm_calls": 1,
+                    "mode": "full"
+                }
+                review_store.save_analysis(
+                    name, prompts.format_conversation([{"role": "assistant", "content": result.content}]),
+                    content_hash(entry), usage, rereview.snapshot(entry), path=analyses_path
+                )
+                t4 = time.perf_counter()
+                for stage, begin, end in (("prompt", t0, t1), ("llm", t1, t2), ("parse", t2, t3), ("persist", t3, t4)):
+                    stages[stage].append((end - begin) * 1000)
+                assert len(summaries) == len(techniques)
+        wall = time.perf_counter() - start
+
+    cassette = llm_client.get_session().cassette
+    analyses = len(stages["llm"])
+    print(f"{analyses} analyses in {wall:.2f}s ({analyses / wall:.1f}/s), cassette latency x{args.latency_scale:g}")
+    print(f"Cassette: {cassette.hits} exact, {cassette.fallbacks} by shape, {cassette.misses} missing\n")
+    print(f"{'stage':<10}{'total':>10}{'p50':>10}{'p95':>10}")
+    for stage, values in stages.items():
+        print(f"{stage:<10}{sum(values):>8.0f}ms{percentile(values, 50):>8.2f}ms{percentile(values, 95):>8.2f}ms")
+    if cassette.misses:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark - load/save times for each JSON backend
+
+Generates a synthetic catalog (50k use cases by default) and analysis history,
+then times parsing and writing with every installed backend.
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+
+import schemas
+import serializers
+from catalog import CATALOG_VERSION, load_catalog
+
+
+def synthetic_catalog(count, technique_count=600, seed=7):
+    """Build a normalized catalog dict with `count` use cases"""
+    rng = random.Random(seed)
+    techniques = {
+        f"T{1000 + i}": {
+            "name": f"Technique {i}",
+            "description": "Adversaries may abuse this behaviour to gain access. " * 3,
+            "tactics": rng.choice(["Initial Access", "Persistence", "Defense Evasion, Privilege Escalation"]),
+            "platforms": rng.choice(["Windows", "Windows, Linux", "SaaS, Office Suite"])
+        }
+        for i in range(technique_count)
+    }
+    ids = list(techniques)
+    usecases = {
+        f"Access - CRO - Synthetic use case {i}": {
+            "techniques": rng.sample(ids, rng.randint(1, 3)),
+            "files": {
+                "search.spl": f'index=ep_winevt_{i % 50} host="$drilldown_dest$" EventCode={4600 + i % 100} | stats count by user, host',
+                "drilldown.spl": f"index=ep_winevt_{i % 50} | stats count by EventCode, AccountName",
+                "README.md": f"# Synthetic {i}\n\n## Objective/Intent\nDetect synthetic behaviour number {i}.\n"
+            }
+        }
+        for i in range(count)
+    }
+    return {"catalog_version": CATALOG_VERSION, "usecases": usecases, "techniques": techniques}
+
+
+def synthetic_analyses(count):
+    return {
+        f"Access - CRO - Synthetic use case {i}": {
+            "analysis": "**Assistant:** ### Technique 1\n1. Not covered: ...\n2. Gaps: ...\n" * 4,
+            "timestamp": "2025-07-06T12:00:00"
+        }
+        for i in range(count)
+    }
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON backends on a synthetic catalog")
+    parser.add_argument("--usecases", type=int, default=50000, help="Number of synthetic use cases")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.usecases)
+    analyses = synthetic_analyses(args.usecases)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_path = os.path.join(tmp, "catalog.json")
+        analyses_path = os.path.join(tmp, "analyses.json")
+        serializers.dump_file(catalog_path, catalog, pretty=True, backend="json")
+        serializers.dump_file(analyses_path, analyses, pretty=True, backend="json")
+        raw_catalog = serializers.read_bytes(catalog_path)
+        raw_analyses = serializers.read_bytes(analyses_path)
+
+        print(f"Synthetic catalog: {args.usecases} use cases, {len(raw_catalog) / 1e6:.1f} MB; "
+              f"analyses: {len(raw_analyses) / 1e6:.1f} MB")
+        print(f"{'backend':<10}{'load catalog':>15}{'load analyses':>15}{'save pretty':>14}{'save compact':>14}")
+
+        for name in serializers.available_backends():
+            backend = serializers.get_backend(name)
+            load_catalog_ms = timed(lambda: backend.loads(raw_catalog), args.repeat)
+            load_analyses_ms = timed(lambda: backend.loads(raw_analyses), args.repeat)
+            save_pretty_ms = timed(lambda: serializers.dump_file(analyses_path, analyses, pretty=True, backend=name), args.repeat)
+            save_compact_ms = timed(lambda: serializers.dump_file(analyses_path, analyses, backend=name), args.repeat)
+            print(f"{name:<10}{load_catalog_ms:>13.1f}ms{load_analyses_ms:>13.1f}ms"
+                  f"{save_pretty_ms:>12.1f}ms{save_compact_ms:>12.1f}ms")
+
+        if schemas.Catalog is not None:
+            typed_ms = timed(lambda: serializers.decode(raw_catalog, type=schemas.Catalog), args.repeat)
+            typed_analyses_ms = timed(lambda: serializers.decode(raw_analyses, type=schemas.Analyses), args.repeat)
+            print(f"{'typed':<10}{typed_ms:>13.1f}ms{typed_analyses_ms:>13.1f}ms   (msgspec structs)")
+
+        full_ms = timed(lambda: load_catalog(catalog_path), args.repeat)
+        print(f"load_catalog() end to end with {serializers.get_backend().name}: {full_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Shared cache tier for catalog snapshots and LLM responses
+
+Streamlit's caches are per process; this tier is shared by every worker
+behind a load balancer. Select it with USECASE_CACHE_URL:
+
+    sqlite:///var/cache/usecase/cache.sqlite   SQLite (WAL) on local disk, workers on one host
+    redis://localhost:6379/0                   any Redis-compatible server, workers on any host
+    none                                       disabled (default)
+
+SQLite's WAL mode needs shared memory between the processes, which network
+filesystems (NFS, SMB) do not provide: keep the file on local disk and use
+Redis when workers run on several hosts.
+
+Values are bytes; callers serialize with serializers.py. For catalogs this
+tier saves each worker re-reading and re-normalizing the file, but every
+worker still decodes its own copy; sharing the catalog's memory between
+workers comes from the packed format (see packed_catalog.py).
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import threading
+
+
+class CacheBackend:
+    """Minimal byte-oriented key/value cache interface"""
+
+    name = "none"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteCache(CacheBackend):
+    """Cache in a SQLite file on local disk; safe for many processes on one host"""
+
+    name = "sqlite"
+    PURGE_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return bytes(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(value), expires_at)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisCache(CacheBackend):
+    """Cache on a Redis-compatible server (Redis, Valkey, KeyDB, ...)"""
+
+    name = "redis"
+
+    def __init__(self, url, prefix="usecase:"):
+        # Imported here: redis costs ~100 ms of cold start and the default is no cache
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for redis:// cache URLs")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def close(self):
+        self._client.close()
+
+
+def create_cache(url):
+    """Build a backend from a cache URL"""
+    if not url or url == "none":
+        return CacheBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_cache():
+    """Process-wide cache backend configured by USECASE_CACHE_URL"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = create_cache(os.getenv("USECASE_CACHE_URL", "none"))
+    return _cache
+
+
+def check_backend(url):
+    """Round-trip set/get/expiry/delete against a backend; returns a list of failures"""
+    cache = create_cache(url)
+    failures = []
+    key = f"selfcheck:{os.getpid()}:{time.time()}"
+    try:
+        cache.set(key, b"value")
+        if cache.get(key) != b"value":
+            failures.append("set/get round trip")
+        cache.delete(key)
+        if cache.get(key) is not None:
+            failures.append("delete")
+        cache.set(key, b"short", ttl=1)
+        time.sleep(1.5)
+        if cache.get(key) is not None:
+            failures.append("ttl expiry")
+    finally:
+        cache.delete(key)
+        cache.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a shared cache backend")
+    parser.add_argument("url", help="Cache URL, e.g. sqlite:///tmp/cache.sqlite or redis://localhost:6379/0")
+    args = parser.parse_args()
+
+    failures = check_backend(args.url)
+    if failures:
+        print(f"❌ {args.url}: failed {', '.join(failures)}")
+        raise SystemExit(1)
+    print(f"✅ {args.url}: set/get, delete and TTL expiry work")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Record/replay cassettes for the LLM client
+
+A cassette is a JSON Lines file (gzip-compressed when it ends in .gz) with
+one interaction per line: the request payload, the response status, the
+time until the response headers arrived and the body with the arrival time
+and size of every chunk read. Set LLM_CASSETTE to use one:
+
+    LLM_CASSETTE=cassettes/batch.jsonl.gz LLM_CASSETTE_MODE=record   append live interactions
+    LLM_CASSETTE=cassettes/batch.jsonl.gz                            replay, no network needed
+    LLM_CASSETTE_LATENCY_SCALE=0                                     replay without waiting
+
+Replay answers a request with the interaction recorded for the same
+payload (ignoring max_tokens); if there is none (e.g. after prompt changes) it falls back to the
+recorded interactions with the same message roles, in turn, unless
+LLM_CASSETTE_STRICT is set. Payloads are recorded and matched decoded,
+whatever their transport encoding (see wire.py).
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+import wire
+import serializers
+
+MODES = ("record", "replay")
+
+
+def request_key(payload):
+    """Stable identity of a request payload
+
+    max_tokens is left out: it is an adaptive budget (generation_policy.py)
+    that changes with observed reply lengths, not part of what was asked.
+    """
+    payload = {k: v for k, v in payload.items() if k != "max_tokens"}
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def request_shape(payload):
+    return "/".join(m.get("role", "") for m in payload.get("messages", []))
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def load_interactions(path):
+    if not os.path.exists(path):
+        return []
+    with _open(path, "rb") as f:
+        return [serializers.loads(line) for line in f if line.strip()]
+
+
+class Cassette:
+    """Interactions of one cassette file, indexed by request key and shape"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.interactions = load_interactions(path)
+        self._by_key = {}
+        self._by_shape = {}
+        self._turns = {}
+        for interaction in self.interactions:
+            self._index(interaction)
+        self.hits = 0
+        self.fallbacks = 0
+        self.misses = 0
+
+    def _index(self, interaction):
+        self._by_key.setdefault(interaction["key"], interaction)
+        self._by_shape.setdefault(interaction["shape"], []).append(interaction)
+
+    def find(self, payload, strict=False):
+        """Recorded interaction for a payload, or None"""
+        with self._lock:
+            interaction = self._by_key.get(request_key(payload))
+            if interaction is not None:
+                self.hits += 1
+                return interaction
+            candidates = [] if strict else self._by_shape.get(request_shape(payload)) or self.interactions
+            if not candidates:
+                self.misses += 1
+                return None
+            shape = request_shape(payload)
+            turn = self._turns.get(shape, 0)
+            self._turns[shape] = turn + 1
+            self.fallbacks += 1
+            return candidates[turn % len(candidates)]
+
+    def append(self, interaction):
+        with self._lock:
+            with _open(self.path, "ab") as f:
+                f.write(serializers.dumps(interaction) + b"\n")
+            self.interactions.append(interaction)
+            self._index(interaction)
+
+
+class RecordingResponse:
+    """Wraps a live streamed response and records it once fully read"""
+
+    def __init__(self, response, cassette, payload, headers_ms):
+        self._response = response
+        self._cassette = cassette
+        self._payload = payload
+        self._headers_ms = headers_ms
+        self.status_code = response.status_code
+        self.encoding = response.encoding
+        self.raw = getattr(response, "raw", None)
+
+    def iter_content(self, chunk_size=1):
+        start = time.perf_counter()
+        chunks = []
+        body = bytearray()
+        for chunk in self._response.iter_content(chunk_size):
+            chunks.append([round((time.perf_counter() - start) * 1000, 2), len(chunk)])
+            body += chunk
+            yield chunk
+        # Only complete bodies are recorded; a cancelled read never gets here
+        self._cassette.append({
+            "key": request_key(self._payload),
+            "shape": request_shape(self._payload),
+            "request": self._payload,
+            "status": self.status_code,
+            "encoding": self.encoding,
+            "headers_ms": round(self._headers_ms, 2),
+            "chunks": chunks,
+            "body": body.decode("utf-8", errors="replace")
+        })
+
+    def close(self):
+        self._response.close()
+
+
+class RecordingSession:
+    """Pass-through to a real requests session that records each interaction"""
+
+    def __init__(self, cassette, session):
+        self.cassette = cassette
+        self._session = session
+
+    def post(self, url, json=None, data=None, **kwargs):
+        payload = json if data is None else wire.decode_body(data, kwargs.get("headers"))
+        start = time.perf_counter()
+        response = self._session.post(url, json=json, data=data, **kwargs)
+        return RecordingResponse(response, self.cassette, payload, (time.perf_counter() - start) * 1000)
+
+
+class ReplayResponse:
+    """Recorded response re-delivered chunk by chunk with scaled timings"""
+
+    def __init__(self, interaction, latency_scale, closed):
+        self.status_code = interaction["status"]
+        self.encoding = interaction.get("encoding") or "utf-8"
+        self._interaction = interaction
+        self._scale = latency_scale
+        self._closed = closed
+
+    def iter_content(self, chunk_size=1):
+        body = self._interaction["body"].encode("utf-8")
+        chunks = self._interaction.get("chunks") or [[0.0, len(body)]]
+        start = time.perf_counter()
+        offset = 0
+        for arrival_ms, size in chunks:
+            delay = arrival_ms * self._scale / 1000 - (time.perf_counter() - start)
+            if delay > 0 and self._closed.wait(delay):
+                return
+            if self._closed.is_set():
+                return
+            yield body[offset:offset + size]
+            offset += size
+        if offset < len(body):
+            yield body[offset:]
+
+    def close(self):
+        self._closed.set()
+
+
+class ReplaySession:
+    """Answers posts from a cassette without touching the network"""
+
+    def __init__(self, cassette, latency_scale=1.0, strict=False):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+    def post(self, url, json=None, data=None, headers=None, timeout=None, **kwargs):
+        payload = (json if data is None else wire.decode_body(data, headers)) or {}
+        interaction = self.cassette.find(payload, self.strict)
+        if interaction is None:
+            raise LookupError(f"No recorded interaction for this request in {self.cassette.path}")
+        closed = threading.Event()
+        closed.wait(interaction.get("headers_ms", 0.0) * self.latency_scale / 1000)
+        return ReplayResponse(interaction, self.latency_scale, closed)
+
+
+def open_session(path, mode="replay", latency_scale=1.0, session=None, strict=False):
+    """Session-like object for llm_client: recording around `session` or replaying"""
+    if mode not in MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+    cassette = Cassette(path)
+    if mode == "record":
+        if session is None:
+            raise ValueError("Recording needs a live HTTP session")
+        return RecordingSession(cassette, session)
+    if not cassette.interactions:
+        raise ValueError(f"Cassette {path} is empty or missing; record it first")
+    return ReplaySession(cassette, latency_scale, strict)
+
+
+def summarize(path):
+    interactions = load_interactions(path)
+    if not interactions:
+        return f"{path}: no interactions"
+    totals = sorted(i["headers_ms"] + (i["chunks"][-1][0] if i.get("chunks") else 0) for i in interactions)
+    shapes = {}
+    for interaction in interactions:
+        shapes[interaction["shape"]] = shapes.get(interaction["shape"], 0) + 1
+    lines = [
+        f"{path}: {len(interactions)} interactions, {os.path.getsize(path) / 1024:.1f} KB",
+        f"  latency p50 {totals[len(totals) // 2]:.0f} ms, max {totals[-1]:.0f} ms",
+        f"  chunks per response up to {max(len(i.get('chunks', ())) for i in interactions)}"
+    ]
+    lines.extend(f"  {count:>5}  {shape}" for shape, count in sorted(shapes.items()))
+    return "\n".join(lines)
+
+
+def record_batch(catalog_path, limit, followups):
+    """Run default-prompt analyses (and follow-ups) through llm_client to record them"""
+    import prompts
+    import llm_client
+    import generation_policy
+    from catalog import load_catalog
+
+    config = llm_client.get_config()
+    if not config:
+        raise SystemExit("❌ Missing DATABRICKS_TOKEN or DATABRICKS_HOST environment variables")
+    table, usecases = load_catalog(catalog_path)
+    complete = lambda messages, **params: llm_client.complete(config, messages, use_cache=False, **params)
+    recorded = 0
+    for name in sorted(usecases)[:limit]:
+        entry = usecases[name]
+        techniques = table.resolve(entry.get("techniques", ()))
+        if not techniques:
+            continue
+        prompt = prompts.build_default_prompt(techniques, entry)
+        result = generation_policy.run(
+            complete, prompts.build_analysis_messages(prompt), generation_policy.ANALYSIS, len(techniques)
+        )
+        history = [{"role": "assistant", "content": result.content}]
+        recorded += 1
+        for question in ("Which fields should the SPL extract to cover this better?",)[:followups]:
+            history.append({"role": "user", "content": question})
+            reply = generation_policy.run(
+                complete, prompts.build_followup_messages(history, prompt), generation_policy.FOLLOWUP,
+                question=question
+            )
+            history.append({"role": "assistant", "content": reply.content})
+            recorded += 1
+        print(f"  {name}")
+    return recorded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or inspect LLM cassettes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record = sub.add_parser("record", help="Record default-prompt analyses from the live endpoint")
+    record.add_argument("output", help="Cassette file to append to (.jsonl or .jsonl.gz)")
+    record.add_argument("--catalog", default="mitre_enriched_with_files.json")
+    record.add_argument("--limit", type=int, default=20, help="Number of use cases")
+    record.add_argument("--followups", type=int, default=1, choices=(0, 1), help="Follow-up turns per use case")
+    info = sub.add_parser("info", help="Summarize a cassette")
+    info.add_argument("cassette")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(summarize(args.cassette))
+        return
+
+    os.environ["LLM_CASSETTE"] = args.output
+    os.environ["LLM_CASSETTE_MODE"] = "record"
+    count = record_batch(args.catalog, args.limit, args.followups)
+    print(f"✅ Recorded {count} interactions into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Use case catalog - shared MITRE ATT&CK technique table and catalog loading
+
+Use cases reference techniques by ID only; every technique is stored once in a
+TechniqueTable of compact records, so memory and parse time scale with the
+number of unique techniques rather than with how often they are referenced.
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+import threading
+
+import perf
+import cache_backend
+import schemas
+import serializers
+
+CATALOG_VERSION = 2
+DEFAULT_CATALOG_PATH = "mitre_enriched_with_files.json"
+CATALOG_CACHE_TTL = 7 * 24 * 3600
+
+_catalog_lock = threading.Lock()
+_catalogs = {}
+
+
+def _text(value):
+    """Catalog field as text: null as empty, lists joined (as some exports store tactics/platforms)"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(item) for item in value)
+    return str(value)
+
+
+class Technique:
+    """Compact technique record shared by every use case that references it"""
+
+    __slots__ = ("ID", "name", "description", "tactics", "platforms")
+
+    def __init__(self, ID, name="", description="", tactics="", platforms=""):
+        self.ID = sys.intern(_text(ID))
+        self.name = sys.intern(_text(name))
+        self.description = _text(description)
+        # Tactic and platform lists repeat across many techniques
+        self.tactics = sys.intern(_text(tactics))
+        self.platforms = sys.intern(_text(platforms))
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"Technique({self.ID!r}, {self.name!r})"
+
+
+class TechniqueTable:
+    """Techniques keyed by ATT&CK ID, one record per unique technique"""
+
+    def __init__(self):
+        self._by_id = {}
+
+    @classmethod
+    def from_dict(cls, techniques):
+        table = cls()
+        for technique_id, record in techniques.items():
+            table.add(dict(record, ID=technique_id))
+        return table
+
+    def add(self, record):
+        """Add a technique dict and return the shared record for its ID"""
+        technique_id = record.get("ID", "")
+        existing = self._by_id.get(technique_id)
+        if existing is not None:
+            return existing
+        return self.add_fields(
+            technique_id,
+            record.get("name", ""),
+            record.get("description", ""),
+            record.get("tactics", ""),
+            record.get("platforms", "")
+        )
+
+    def add_fields(self, technique_id, name="", description="", tactics="", platforms=""):
+        existing = self._by_id.get(technique_id)
+        if existing is not None:
+            return existing
+        technique = Technique(technique_id, name, description, tactics, platforms)
+        self._by_id[technique.ID] = technique
+        return technique
+
+    def get(self, technique_id):
+        return self._by_id.get(technique_id)
+
+    def resolve(self, technique_ids):
+        """Return the records for a use case's technique IDs, unknown IDs as bare records"""
+        return [self._by_id.get(tid) or Technique(tid) for tid in technique_ids]
+
+    def to_dict(self):
+        return {
+            tid: {k: v for k, v in t.to_dict().items() if k != "ID"}
+            for tid, t in self._by_id.items()
+        }
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, technique_id):
+        return technique_id in self._by_id
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+
+def is_normalized(data):
+    return isinstance(data, dict) and data.get("catalog_version") == CATALOG_VERSION
+
+
+def normalize_catalog(data):
+    """Split a catalog into (TechniqueTable, use cases holding technique ID tuples)
+
+    Accepts both the normalized layout and the legacy layout where every use
+    case embeds full technique copies.
+    """
+    if is_normalized(data):
+        table = TechniqueTable.from_dict(data.get("techniques", {}))
+        usecases = {
+            name: {
+                "techniques": tuple(sys.intern(tid) for tid in entry.get("techniques", [])),
+                "files": entry.get("files", {})
+            }
+            for name, entry in data.get("usecases", {}).items()
+        }
+        return table, usecases
+
+    table = TechniqueTable()
+    usecases = {}
+    for name, entry in data.items():
+        ids = tuple(table.add(t).ID for t in entry.get("techniques", []))
+        usecases[name] = {"techniques": ids, "files": entry.get("files", {})}
+    return table, usecases
+
+
+def from_catalog_struct(catalog):
+    """Build (TechniqueTable, use cases) from a decoded schemas.Catalog struct"""
+    table = TechniqueTable()
+    for technique_id, record in catalog.techniques.items():
+        table.add_fields(technique_id, record.name, record.description, record.tactics, record.platforms)
+    usecases = {
+        name: {
+            "techniques": tuple(sys.intern(tid) for tid in usecase.techniques),
+            "files": usecase.files
+        }
+        for name, usecase in catalog.usecases.items()
+    }
+    return table, usecases
+
+
+def content_hash(entry):
+    """Fingerprint of a use case's SPL and README bodies, used to detect stale reviews"""
+    files = entry.get("files", {})
+    digest = hashlib.sha1()
+    for filename in ("search.spl", "drilldown.spl", "README.md"):
+        digest.update((files.get(filename) or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def denormalize_usecase(table, entry):
+    """Rebuild the legacy embedded form of one use case"""
+    return {
+        "techniques": [t.to_dict() for t in table.resolve(entry.get("techniques", ()))],
+        "files": entry.get("files", {})
+    }
+
+
+def to_normalized_dict(table, usecases):
+    return {
+        "catalog_version": CATALOG_VERSION,
+        "usecases": {
+            name: {"techniques": list(entry["techniques"]), "files": dict(entry["files"])}
+            for name, entry in usecases.items()
+        },
+        "techniques": table.to_dict()
+    }
+
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    """Load a catalog file in any layout and return (TechniqueTable, use cases)
+
+    Packed catalogs (see packed_catalog.py) are memory-mapped instead of read.
+    """
+    import packed_catalog
+    if packed_catalog.is_packed(path):
+        return packed_catalog.open_packed(path)
+    return load_catalog_bytes(serializers.read_bytes(path))
+
+
+def load_catalog_bytes(raw):
+    # Normalized files always start with their version marker
+    if schemas.Catalog is not None and b'"catalog_version"' in raw[:64]:
+        return from_catalog_struct(serializers.decode(raw, type=schemas.Catalog))
+    return normalize_catalog(serializers.loads(raw))
+
+
+
+def _load_shared(path, mtime):
+    """Load via the shared cache tier so workers skip re-reading and re-normalizing
+
+    Each worker still holds its own decoded copy; only packed catalogs share
+    memory across workers (through the page cache), so they bypass the tier.
+    """
+    import packed_catalog
+    cache = cache_backend.get_cache()
+    # Packed catalogs are already shared between workers through the page cache
+    if cache.name == "none" or packed_catalog.is_packed(path):
+        return load_catalog(path)
+    key = f"catalog:{os.path.abspath(path)}:{mtime}"
+    raw = cache.get(key)
+    if raw is not None:
+        return load_catalog_bytes(raw)
+    table, usecases = load_catalog(path)
+    cache.set(key, serializers.dumps(to_normalized_dict(table, usecases)), ttl=CATALOG_CACHE_TTL)
+    return table, usecases
+
+
+def get_catalog(path=DEFAULT_CATALOG_PATH):
+    """Return the process-wide (TechniqueTable, use cases) for a path
+
+    The catalog is loaded on first use and shared by every caller; it is only
+    reloaded when the file's modification time changes.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cached = _catalogs.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _catalog_lock:
+        cached = _catalogs.get(path)
+        if cached is None or cached[0] != mtime:
+            with perf.timed("catalog"):
+                cached = (mtime, _load_shared(path, mtime))
+            _catalogs[path] = cached
+    return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a catalog to the normalized technique-table layout")
+    parser.add_argument("catalog", help="Catalog file in legacy or normalized layout")
+    parser.add_argument("--output", required=True, help="Normalized catalog file to write")
+    args = parser.parse_args()
+
+    table, usecases = load_catalog(args.catalog)
+    serializers.dump_file(args.output, to_normalized_dict(table, usecases), pretty=True)
+    print(f"✅ {len(usecases)} use cases, {len(table)} unique techniques written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Analysis export - saved reviews to a columnar Parquet/Arrow dataset (or CSV)
+
+Writes one row per use case x technique with gap flags, recommendation
+counts, model, token usage and latency, in bounded record batches, and
+prints vectorized summaries over the result for management reporting.
+Rows carry the review's mode: a "rereview" only looked at what changed since
+an earlier version, so the summaries count full reviews only.
+"""
+
+import os
+import re
+import csv
+import argparse
+
+import review_store
+from catalog import DEFAULT_CATALOG_PATH, get_catalog
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+BATCH_ROWS = 5000
+TECHNIQUE_ID_RE = re.compile(r"\bT\d{4}(?:\.\d{3})?\b")
+ITEM_RE = re.compile(r"^\s*(?:[#*_]+\s*)?([1-4])[.)]", re.MULTILINE)
+BULLET_RE = re.compile(r"^\s*(?:[-*•+]|\d+[.)]|[a-z][.)])\s+", re.MULTILINE)
+NEGATIVE_RE = re.compile(
+    r"\b(?:none|nothing|no (?:gaps?|mistakes?|issues?|changes?)(?: (?:found|identified|needed))?|"
+    r"not applicable|n/a|fully covered)\b",
+    re.IGNORECASE
+)
+
+LABEL_RE = re.compile(r"^[*_\s]*(?:[\w /-]{1,40}:)?[*_\s]*")
+# What may precede a technique ID on its heading line, e.g. "### Technique 2: "
+HEADING_PREFIX_RE = re.compile(r"\s*(?:#{1,6}\s*|\*\*)?(?:Technique\s+\d+\s*[:.)-]?\s*)?$")
+
+COLUMNS = (
+    ("usecase", "string"),
+    ("technique_id", "string"),
+    ("mode", "string"),
+    ("technique_count", "int32"),
+    ("timestamp", "string"),
+    ("model", "string"),
+    ("prompt_tokens", "int64"),
+    ("completion_tokens", "int64"),
+    ("latency_ms", "float64"),
+    ("llm_calls", "int32"),
+    ("uncovered_gap", "bool"),
+    ("mistakes_found", "bool"),
+    ("changes_suggested", "bool"),
+    ("recommendation_count", "int32"),
+    ("analysis_chars", "int64"),
+)
+
+
+def initial_analysis(analysis_text):
+    """The first assistant reply of a saved transcript (before any follow-ups)"""
+    text = analysis_text.split("\n\n**User:**", 1)[0]
+    text = text.split("\n\n**Final Review:**", 1)[0]
+    return text.replace("**Assistant:**", "", 1).strip()
+
+
+def _find_section(text, needle):
+    """Start of the heading line mentioning needle, else of its first mention; -1 if absent"""
+    first = pos = text.find(needle)
+    while pos >= 0:
+        line_start = text.rfind("\n", 0, pos) + 1
+        if HEADING_PREFIX_RE.match(text, line_start, pos):
+            return line_start
+        pos = text.find(needle, pos + 1)
+    return first
+
+
+def split_technique_sections(text, technique_ids):
+    """Map technique ID -> the part of the analysis discussing it, from its heading on"""
+    positions = []
+    for idx, technique_id in enumerate(technique_ids, 1):
+        pos = _find_section(text, technique_id)
+        if pos < 0:
+            pos = _find_section(text, f"Technique {idx}")
+        positions.append(pos)
+
+    if len(technique_ids) == 1 or all(pos < 0 for pos in positions):
+        return {technique_id: text for technique_id in technique_ids}
+
+    found = sorted(pos for pos in positions if pos >= 0)
+    sections = {}
+    for technique_id, pos in zip(technique_ids, positions):
+        if pos < 0:
+            sections[technique_id] = ""
+            continue
+        following = [p for p in found if p > pos]
+        sections[technique_id] = text[pos:following[0] if following else len(text)]
+    return sections
+
+
+def section_items(section):
+    """Split a technique section into its four numbered answers"""
+    matches = list(ITEM_RE.finditer(section))
+    items = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        number = int(match.group(1))
+        if number not in items:
+            items[number] = section[match.end():following.start() if following else len(section)].strip()
+    return items
+
+
+def _is_finding(text):
+    # Drop a leading "**Mistakes:**"-style label before checking for "None" etc.
+    text = LABEL_RE.sub("", text, count=1)
+    return bool(text) and not NEGATIVE_RE.match(text)
+
+
+def summarize_section(section):
+    """Gap flags and recommendation count for one technique section"""
+    items = section_items(section)
+    recommendations = items.get(4, "")
+    # Item 4's first line is usually the heading; count bullets after it
+    bullets = len(BULLET_RE.findall(recommendations.partition("\n")[2]))
+    return {
+        "uncovered_gap": _is_finding(items.get(1, "")),
+        "mistakes_found": _is_finding(items.get(2, "")),
+        "changes_suggested": _is_finding(items.get(3, "")),
+        "recommendation_count": bullets or (1 if _is_finding(recommendations) else 0)
+    }
+
+
+def summarize_structured(item):
+    """Gap flags and recommendation count from a structured-output technique entry"""
+    return {
+        "uncovered_gap": bool(item.get("uncovered_behaviors")),
+        "mistakes_found": bool(item.get("mistakes")),
+        "changes_suggested": bool(item.get("suggested_spl_changes")),
+        "recommendation_count": len(item.get("recommendations", []))
+    }
+
+
+def iter_rows(analyses, usecases):
+    """Yield one export row per use case x technique"""
+    for name, record in analyses.items():
+        text = record.get("analysis", "")
+        initial = initial_analysis(text)
+        entry = usecases.get(name)
+        if entry is not None and entry.get("techniques"):
+            technique_ids = list(entry["techniques"])
+        else:
+            technique_ids = list(dict.fromkeys(TECHNIQUE_ID_RE.findall(initial))) or [""]
+
+        structured = {
+            item["technique_id"]: item
+            for item in (record.get("structured") or {}).get("techniques", [])
+        }
+        sections = {} if structured else split_technique_sections(initial, technique_ids)
+        for technique_id in technique_ids:
+            row = {
+                "usecase": name,
+                "technique_id": technique_id,
+                "mode": record.get("mode") or "full",
+                "technique_count": len(technique_ids),
+                "timestamp": record.get("timestamp", ""),
+                "model": record.get("model", ""),
+                "prompt_tokens": record.get("prompt_tokens", 0),
+                "completion_tokens": record.get("completion_tokens", 0),
+                "latency_ms": float(record.get("latency_ms", 0.0)),
+                "llm_calls": record.get("llm_calls", 0),
+                "analysis_chars": len(text)
+            }
+            if structured:
+                row.update(summarize_structured(structured.get(technique_id, {})))
+            else:
+                row.update(summarize_section(sections.get(technique_id, "")))
+            yield row
+
+
+def _batches(rows, size=BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def arrow_schema():
+    return pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in COLUMNS])
+
+
+def write_export(rows, output_path, fmt):
+    """Write rows in record batches; returns the number of rows written"""
+    count = 0
+    if fmt == "csv":
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=[name for name, _ in COLUMNS])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Parquet/Arrow export; use --format csv")
+
+    schema = arrow_schema()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(output_path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(output_path, schema)
+    try:
+        for batch in _batches(rows):
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+def read_export(path):
+    if path.endswith(".csv"):
+        from pyarrow import csv as pa_csv
+        schema = arrow_schema()
+        options = pa_csv.ConvertOptions(column_types={field.name: field.type for field in schema})
+        return pa_csv.read_csv(path, convert_options=options)
+    if path.endswith((".arrow", ".feather")):
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).read_all()
+    return pq.read_table(path)
+
+
+def summarize(table):
+    """Vectorized fleet-wide summaries of full reviews: per technique and per month"""
+    if "mode" in table.column_names:
+        table = table.filter(pc.equal(table["mode"], "full"))
+    flags = table.append_column(
+        "any_gap",
+        pc.or_(pc.or_(table["uncovered_gap"], table["mistakes_found"]), table["changes_suggested"])
+    )
+    by_technique = flags.group_by("technique_id").aggregate([
+        ("usecase", "count"),
+        ("any_gap", "mean"),
+        ("recommendation_count", "mean"),
+        ("latency_ms", "mean")
+    ]).sort_by([("usecase_count", "descending")])
+
+    months = table.append_column("month", pc.utf8_slice_codeunits(table["timestamp"], 0, 7))
+    by_month = months.group_by("month").aggregate([
+        ("usecase", "count_distinct"),
+        ("uncovered_gap", "mean"),
+        ("completion_tokens", "mean")
+    ]).sort_by("month")
+    return by_technique, by_month
+
+
+def format_table(table):
+    lines = ["  ".join(f"{name:>22}" for name in table.column_names)]
+    for row in table.to_pylist():
+        lines.append("  ".join(
+            f"{value:>22.2f}" if isinstance(value, float) else f"{str(value):>22}"
+            for value in row.values()
+        ))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export saved analyses to a columnar dataset")
+    parser.add_argument("--analyses", default=review_store.ANALYSES_PATH, help="Saved analyses file")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help="Catalog used to map use cases to techniques")
+    parser.add_argument("--format", choices=("parquet", "arrow", "csv"), default="parquet" if pa else "csv")
+    parser.add_argument("--output", default=None, help="Output file (defaults to usecase_analyses.<format>)")
+    parser.add_argument("--summary", action="store_true", help="Print per-technique and per-month summaries")
+    args = parser.parse_args()
+
+    output = args.output or f"usecase_analyses.{args.format}"
+    usecases = get_catalog(args.catalog)[1] if os.path.exists(args.catalog) else {}
+    analyses = review_store.load_analyses(args.analyses)
+
+    count = write_export(iter_rows(analyses, usecases), output, args.format)
+    print(f"✅ Exported {count} rows from {len(analyses)} analyses to {output}")
+
+    if args.summary:
+        if pa is None:
+            print("❌ Summaries need pyarrow")
+            return
+        by_technique, by_month = summarize(read_export(output))
+        print("\nPer technique:")
+        print(format_table(by_technique))
+        print("\nPer month:")
+        print(format_table(by_month))
+
+
+if __name__ == "__main__":
+    main()
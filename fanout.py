@@ -0,0 +1,101 @@
+"""
+Per-technique fan-out analysis
+
+Sends one smaller request per technique in parallel, each sharing the same
+SPL/README context, and merges the replies into a single analysis. Wall-clock
+time is roughly that of the slowest technique instead of the sum.
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import prompts
+import structured_output
+import generation_policy
+from llm_client import LLMError
+
+MAX_WORKERS = 8
+POLL_INTERVAL = 0.5
+HEADING_RE = re.compile(r"^#{1,6}\s")
+
+
+def technique_prompt(technique, entry):
+    """Review prompt for a single technique with the use case's shared file context"""
+    return prompts.build_default_prompt([technique], entry)
+
+
+def _analyze_one(complete, technique, entry, structured):
+    prompt = technique_prompt(technique, entry)
+    if structured:
+        document, calls = structured_output.run_structured_analysis(complete, [technique], entry, prompt)
+        return document, calls
+    result = generation_policy.run(complete, prompts.build_analysis_messages(prompt), generation_policy.TECHNIQUE)
+    return result.content, [result]
+
+
+def run_fanout_analysis(complete, techniques, entry, structured=False, max_workers=MAX_WORKERS, on_wait=None):
+    """Analyze every technique in parallel and merge the results
+
+    `complete(messages, **params)` must be thread-safe and return an LLMResult.
+    `on_wait()` is called every POLL_INTERVAL while requests are pending; if it
+    raises, the merge is abandoned without waiting for the workers (the
+    caller is expected to cancel their requests).
+    Returns (merged markdown, structured document or None, all LLMResults,
+    wall-clock milliseconds). Techniques whose request failed are reported in
+    the merged output; LLMError is raised only if every technique failed.
+    """
+    start = time.perf_counter()
+    workers = max(1, min(max_workers, len(techniques)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout")
+    try:
+        futures = [pool.submit(_analyze_one, complete, t, entry, structured) for t in techniques]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=POLL_INTERVAL)
+            if pending and on_wait is not None:
+                on_wait()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    outcomes = []
+    errors = {}
+    for technique, future in zip(techniques, futures):
+        try:
+            outcomes.append((technique, future.result()))
+        except LLMError as e:
+            errors[technique.ID] = str(e)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    if not outcomes:
+        raise LLMError("; ".join(f"{tid}: {error}" for tid, error in errors.items()))
+
+    calls = [call for _, (_, technique_calls) in outcomes for call in technique_calls]
+    if structured:
+        document = {"techniques": [], "failed": list(errors)}
+        for _, (technique_document, _) in outcomes:
+            document["techniques"].extend(technique_document["techniques"])
+            document["failed"].extend(technique_document["failed"])
+        return structured_output.render_markdown(document, techniques), document, calls, wall_ms
+
+    return merge_markdown(outcomes, errors), None, calls, wall_ms
+
+
+def strip_heading(content, technique):
+    """Reply without its own leading technique heading (SYSTEM_PROMPT asks every reply for one)"""
+    content = content.strip()
+    first, _, rest = content.partition("\n")
+    if HEADING_RE.match(first) and ("technique" in first.lower() or technique.ID in first):
+        return rest.strip()
+    return content
+
+
+def merge_markdown(outcomes, errors):
+    """Combine per-technique replies under one heading per technique"""
+    sections = []
+    for idx, (technique, (content, _)) in enumerate(outcomes, 1):
+        heading = f"### Technique {idx}: {technique.ID} {technique.name}".rstrip()
+        sections.append(f"{heading}\n{strip_heading(content, technique)}")
+    for technique_id, error in errors.items():
+        sections.append(f"### {technique_id}\n_Request failed: {error}_")
+    return "\n\n".join(sections)
@@ -0,0 +1,177 @@
+"""
+Generation limits per LLM call - max_tokens, temperature and stop sequences
+
+Instead of reserving 2048 tokens for every call, max_tokens is sized from
+the task type, the number of techniques covered and the reply lengths
+observed so far (saved analyses plus replies seen by this process): the
+95th percentile per technique (or per follow-up reply) plus headroom. A
+reply that still stops at the limit is requested once more at CEILING, so
+tight budgets never truncate a review.
+"""
+
+import os
+import re
+import threading
+from collections import deque
+
+import review_store
+import serializers
+
+ANALYSIS = "analysis"      # free-form review of every technique of a use case
+TECHNIQUE = "technique"    # fan-out request for a single technique
+STRUCTURED = "structured"  # JSON review (see structured_output.py)
+FOLLOWUP = "followup"      # answer to a follow-up question
+REREVIEW = "rereview"      # diff-aware re-review (see rereview.py)
+TASKS = (ANALYSIS, TECHNIQUE, STRUCTURED, FOLLOWUP, REREVIEW)
+
+TEMPERATURE = 0.1
+CEILING = int(os.getenv("LLM_MAX_TOKENS_CEILING", 4096))
+FLOOR = 256
+BASE_TOKENS = 128  # intro/closing text around the per-technique sections
+HEADROOM = 1.3
+MIN_SAMPLES = 5
+WINDOW = 500
+CHARS_PER_TOKEN = 4
+
+# Per-technique (per reply for follow-ups) budgets until MIN_SAMPLES were observed
+PRIORS = {ANALYSIS: 650, TECHNIQUE: 650, STRUCTURED: 400, FOLLOWUP: 450, REREVIEW: 300}
+# A single-technique reply is complete once the model starts on another technique
+STOP_SEQUENCES = {TECHNIQUE: ["\n### Technique 2"]}
+# Follow-ups asking for rewritten SPL or exhaustive answers get a double budget
+LONG_FOLLOWUP_RE = re.compile(
+    r"\b(?:rewrite|rewritten|full|complete|entire|every|all techniques|example|spl|quer(?:y|ies))\b",
+    re.IGNORECASE
+)
+TECHNIQUE_HEADING_RE = re.compile(r"^#+\s*Technique\s+\d+", re.MULTILINE | re.IGNORECASE)
+TECHNIQUE_ID_RE = re.compile(r"\bT\d{4}(?:\.\d{3})?\b")
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _technique_count(text):
+    headings = len(TECHNIQUE_HEADING_RE.findall(text))
+    return max(1, headings or len(set(TECHNIQUE_ID_RE.findall(text))))
+
+
+def transcript_lengths(analysis_text):
+    """(tokens per technique of the initial analysis, [tokens per follow-up reply]) of a saved transcript"""
+    body = analysis_text.split("\n\n**Final Review:**", 1)[0]
+    turns = re.split(r"\n\n\*\*(User|Assistant):\*\* ", "\n\n" + body.replace("**Assistant:** ", "", 1))
+    initial = turns[0].strip()
+    followups = [content for role, content in zip(turns[1::2], turns[2::2]) if role == "Assistant"]
+    per_technique = len(initial) / CHARS_PER_TOKEN / _technique_count(initial) if initial else 0
+    return per_technique, [len(reply) / CHARS_PER_TOKEN for reply in followups]
+
+
+class GenerationPolicy:
+    """Rolling reply-length statistics per task and the limits derived from them"""
+
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self._samples = {task: deque(maxlen=window) for task in TASKS}
+        self._truncated = {task: 0 for task in TASKS}
+
+    def seed(self, analyses):
+        """Learn reply lengths from saved analyses (review_store.load_analyses())"""
+        for record in analyses.values():
+            text = record.get("analysis", "") if isinstance(record, dict) else ""
+            if not text:
+                continue
+            per_technique, followups = transcript_lengths(text)
+            with self._lock:
+                if per_technique:
+                    self._samples[ANALYSIS].append(per_technique)
+                self._samples[FOLLOWUP].extend(followups)
+
+    def observe(self, task, result, technique_count=1):
+        """Record the length of a reply; cached replies carry no new information"""
+        if result.cached:
+            return
+        tokens = result.completion_tokens or len(result.content) / CHARS_PER_TOKEN
+        with self._lock:
+            self._samples[task].append(tokens / max(1, technique_count))
+            if result.truncated:
+                self._truncated[task] += 1
+
+    def per_unit(self, task):
+        with self._lock:
+            samples = list(self._samples[task])
+        if len(samples) < MIN_SAMPLES:
+            # Technique replies look like one section of a full analysis
+            if task == TECHNIQUE:
+                return self.per_unit(ANALYSIS)
+            return PRIORS[task]
+        return _percentile(samples, 95)
+
+    def limits(self, task, technique_count=1, question=""):
+        """Keyword arguments for llm_client.complete(): max_tokens, temperature and stop"""
+        units = max(1, technique_count)
+        if task == FOLLOWUP:
+            units = 2 if LONG_FOLLOWUP_RE.search(question) or len(question) > 400 else 1
+        budget = BASE_TOKENS + self.per_unit(task) * units * HEADROOM
+        # Round up to a multiple of 64 so similar prompts share cache keys
+        max_tokens = min(CEILING, max(FLOOR, -(-int(budget) // 64) * 64))
+        params = {"max_tokens": max_tokens, "temperature": TEMPERATURE}
+        if task in STOP_SEQUENCES:
+            params["stop"] = STOP_SEQUENCES[task]
+        return params
+
+    def stats(self):
+        """Per task: samples, p50/p95 tokens per unit and truncated replies"""
+        with self._lock:
+            snapshot = {task: list(samples) for task, samples in self._samples.items()}
+            truncated = dict(self._truncated)
+        return {
+            task: {
+                "samples": len(samples),
+                "p50": _percentile(samples, 50) if samples else 0,
+                "p95": _percentile(samples, 95) if samples else 0,
+                "truncated": truncated[task]
+            }
+            for task, samples in snapshot.items()
+        }
+
+
+def format_stats(policy):
+    lines = [f"{'task':<11}{'samples':>8}{'p50':>7}{'p95':>7}{'max_tokens':>11}{'truncated':>10}"]
+    for task, stats in policy.stats().items():
+        lines.append(
+            f"{task:<11}{stats['samples']:>8}{stats['p50']:>7.0f}{stats['p95']:>7.0f}"
+            f"{policy.limits(task)['max_tokens']:>11}{stats['truncated']:>10}"
+        )
+    return "\n".join(lines)
+
+
+_lock = threading.Lock()
+_policy = None
+
+
+def get_policy():
+    """Process-wide policy, seeded from the saved analyses on first use"""
+    global _policy
+    if _policy is not None:
+        return _policy
+    with _lock:
+        if _policy is None:
+            policy = GenerationPolicy()
+            try:
+                policy.seed(review_store.load_analyses())
+            except (OSError,) + serializers.decode_errors():
+                pass  # start from the priors
+            _policy = policy
+    return _policy
+
+
+def run(complete, messages, task, technique_count=1, question="", **params):
+    """Call `complete(messages, **params)` with policy limits; retries once at CEILING if truncated"""
+    policy = get_policy()
+    limits = policy.limits(task, technique_count, question)
+    result = complete(messages, **limits, **params)
+    policy.observe(task, result, technique_count)
+    if result.truncated and limits["max_tokens"] < CEILING:
+        result = complete(messages, **dict(limits, max_tokens=CEILING), **params)
+        policy.observe(task, result, technique_count)
+    return result
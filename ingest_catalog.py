@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Streaming catalog ingestion - build the use case catalog from Splunk app exports
+
+Walks a directory of exported use case folders (each holding search.spl,
+drilldown.spl and README.md), enriches the referenced MITRE ATT&CK technique
+IDs from a local STIX bundle and writes the normalized catalog one entry at a
+time, so memory stays flat no matter how many detections are exported.
+"""
+
+import os
+import re
+import json
+import argparse
+
+from catalog import CATALOG_VERSION
+
+USECASE_FILES = ("search.spl", "drilldown.spl", "README.md")
+TECHNIQUE_ID_RE = re.compile(r"\bT\d{4}(?:\.\d{3})?\b")
+CITATION_RE = re.compile(r"\s*\(Citation:[^)]*\)")
+SENTENCE_END_RE = re.compile(r"(?<=\.)\s")
+
+
+def _short_description(text):
+    """First sentence of a STIX description, without citation markers"""
+    text = CITATION_RE.sub("", text or "").strip()
+    return SENTENCE_END_RE.split(text, 1)[0]
+
+
+def load_attack_techniques(bundle_path):
+    """Build a compact technique lookup keyed by ATT&CK ID from a STIX bundle"""
+    with open(bundle_path, encoding="utf-8") as f:
+        objects = json.load(f).get("objects", [])
+
+    techniques = {}
+    for obj in objects:
+        if obj.get("type") != "attack-pattern":
+            continue
+        if obj.get("revoked") or obj.get("x_mitre_deprecated"):
+            continue
+        external_id = next(
+            (ref.get("external_id") for ref in obj.get("external_references", [])
+             if ref.get("source_name") == "mitre-attack"),
+            None
+        )
+        if not external_id:
+            continue
+        tactics = [
+            phase["phase_name"].replace("-", " ").title()
+            for phase in obj.get("kill_chain_phases", [])
+            if phase.get("kill_chain_name") == "mitre-attack"
+        ]
+        techniques[external_id] = {
+            "ID": external_id,
+            "name": obj.get("name", ""),
+            "description": _short_description(obj.get("description", "")),
+            "tactics": ", ".join(tactics),
+            "platforms": ", ".join(obj.get("x_mitre_platforms", []))
+        }
+    # The bundle itself is dropped here; only the compact table is kept
+    return techniques
+
+
+def read_usecase_files(folder):
+    """Read the exported SPL and README files of one use case folder"""
+    files = {}
+    for filename in USECASE_FILES:
+        try:
+            with open(os.path.join(folder, filename), encoding="utf-8") as f:
+                files[filename] = f.read()
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def extract_technique_ids(files):
+    """Collect technique IDs referenced in README and SPL, in order of appearance"""
+    seen = {}
+    for filename in ("README.md", "search.spl", "drilldown.spl"):
+        for technique_id in TECHNIQUE_ID_RE.findall(files.get(filename, "")):
+            seen.setdefault(technique_id, None)
+    return list(seen)
+
+
+def iter_usecase_dirs(apps_dir):
+    """Yield (usecase name, folder path) for every exported use case folder"""
+    with os.scandir(apps_dir) as entries:
+        names = sorted(entry.name for entry in entries if entry.is_dir())
+    for name in names:
+        folder = os.path.join(apps_dir, name)
+        if any(os.path.isfile(os.path.join(folder, f)) for f in USECASE_FILES):
+            yield name, folder
+
+
+def iter_usecases(apps_dir):
+    """Yield (name, entry) pairs one use case at a time, techniques as ID references"""
+    for name, folder in iter_usecase_dirs(apps_dir):
+        files = read_usecase_files(folder)
+        yield name, {"techniques": extract_technique_ids(files), "files": files}
+
+
+def write_catalog(entries, techniques, output_path, index_path=None):
+    """Stream (name, entry) pairs into a normalized catalog file plus a JSONL offset index
+
+    Use cases are written as they arrive; the shared technique table is
+    appended at the end with only the techniques that were referenced. Each
+    index line records the byte offset and length of one use case's value in
+    the catalog file, so single use cases can be read back without a full
+    parse. Files are written to temporary paths and swapped in once complete.
+    """
+    index_path = index_path or output_path + ".idx"
+    tmp_output = output_path + ".tmp"
+    tmp_index = index_path + ".tmp"
+    referenced = set()
+    count = 0
+
+    with open(tmp_output, "wb") as out, open(tmp_index, "w", encoding="utf-8") as idx:
+        out.write(f'{{\n  "catalog_version": {CATALOG_VERSION},\n  "usecases": {{'.encode("utf-8"))
+        for name, entry in entries:
+            referenced.update(entry["techniques"])
+            prefix = ("," if count else "") + "\n    " + json.dumps(name, ensure_ascii=False) + ": "
+            out.write(prefix.encode("utf-8"))
+            value = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+            idx.write(json.dumps({"name": name, "offset": out.tell(), "length": len(value)}) + "\n")
+            out.write(value)
+            count += 1
+        out.write(b"\n  },\n  \"techniques\": ")
+        table = {}
+        for technique_id in sorted(referenced):
+            record = techniques.get(technique_id, {})
+            table[technique_id] = {k: v for k, v in record.items() if k != "ID"}
+        out.write(json.dumps(table, ensure_ascii=False).encode("utf-8"))
+        out.write(b"\n}\n")
+
+    os.replace(tmp_output, output_path)
+    os.replace(tmp_index, index_path)
+    return count
+
+
+def read_entry(catalog_path, offset, length):
+    """Read a single catalog entry using an offset from the index"""
+    with open(catalog_path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the use case catalog from Splunk app exports")
+    parser.add_argument("apps_dir", help="Directory of exported use case folders")
+    parser.add_argument("--attack", required=True, help="Path to the MITRE ATT&CK STIX bundle (enterprise-attack.json)")
+    parser.add_argument("--output", default="mitre_enriched_with_files.json", help="Catalog file to write")
+    parser.add_argument("--index", default=None, help="Offset index file (defaults to <output>.idx)")
+    args = parser.parse_args()
+
+    techniques = load_attack_techniques(args.attack)
+    print(f"✅ Loaded {len(techniques)} ATT&CK techniques")
+
+    count = write_catalog(iter_usecases(args.apps_dir), techniques, args.output, args.index)
+    print(f"✅ Wrote {count} use cases to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
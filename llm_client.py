@@ -0,0 +1,587 @@
+"""
+Databricks LLM client - lazily created, process-wide configuration and HTTP session
+
+Nothing here touches the environment, .env or the network at import time;
+the config and the pooled requests session are built on first use and then
+shared by every Streamlit session and rerun in the process.
+
+Requests run on a small worker pool and are represented by cancellable
+RequestHandles with separate connect/read timeouts and an overall deadline,
+so a caller can stop waiting (and drop the connection) as soon as the
+result is no longer wanted. stream() yields the reply as it is generated
+for callers that forward it (see api_server.py). Request bodies are
+minimized and compressed before they are sent (see wire.py).
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import perf
+import wire
+import serializers
+import cache_backend
+import prefix_reuse
+
+ENDPOINT_NAME = "databricks-meta-llama-3-3-70b-instruct"
+RESPONSE_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+# Overall per-call deadline, including time spent queued for a worker
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 120))
+MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", 32))
+CHUNK_SIZE = 16 * 1024
+# Shapes of a 200 body that parse_response cannot read
+MALFORMED_ERRORS = (KeyError, IndexError, TypeError, AttributeError)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_config = None
+_config_loaded = False
+_session = None
+_executor = None
+
+
+class LLMError(Exception):
+    """Raised when the serving endpoint call fails or is misconfigured"""
+
+
+class LLMCancelled(LLMError):
+    """Raised when a request was cancelled before its result was delivered"""
+
+
+class LLMTimeout(LLMError):
+    """Raised when a request exceeds its overall deadline"""
+
+
+def get_config():
+    """Initialize Databricks configuration for HTTP requests (once per process)"""
+    global _config, _config_loaded
+    if _config_loaded:
+        return _config
+    with _lock:
+        if not _config_loaded:
+            with perf.timed("config"):
+                # Load environment variables from .env file if it exists
+                try:
+                    from dotenv import load_dotenv
+                    load_dotenv()
+                except ImportError:
+                    pass  # dotenv not installed, use system environment variables
+
+                token = os.getenv("DATABRICKS_TOKEN")
+                host = os.getenv("DATABRICKS_HOST")
+                if cassette_mode() == "replay":
+                    # Replays never reach the network; credentials are optional
+                    token = token or "replay"
+                    host = host or "http://cassette.invalid"
+                if token and host:
+                    _config = {
+                        "token": token,
+                        "host": host.rstrip('/'),
+                        "headers": {
+                            "Authorization": f"Bearer {token}",
+                            "Content-Type": "application/json"
+                        }
+                    }
+                _config_loaded = True
+    return _config
+
+
+def cassette_mode():
+    """"record" or "replay" when LLM_CASSETTE is set (see cassette.py), else None"""
+    if not os.getenv("LLM_CASSETTE"):
+        return None
+    return os.getenv("LLM_CASSETTE_MODE", "replay")
+
+
+def get_session():
+    """Return the shared, connection-pooled HTTP session (or the cassette standing in for it)"""
+    global _session
+    if _session is not None:
+        return _session
+    with _lock:
+        if _session is None:
+            with perf.timed("http client"):
+                mode = cassette_mode()
+                session = None
+                if mode != "replay":
+                    import requests
+                    session = requests.Session()
+                if mode:
+                    import cassette
+                    session = cassette.open_session(
+                        os.getenv("LLM_CASSETTE"), mode,
+                        latency_scale=float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", 1)),
+                        session=session,
+                        strict=bool(os.getenv("LLM_CASSETTE_STRICT"))
+                    )
+                _session = session
+    return _session
+
+
+def get_executor():
+    """Process-wide worker pool that performs the HTTP requests"""
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_INFLIGHT, thread_name_prefix="llm")
+    return _executor
+
+
+def endpoint_url(config):
+    return f"{config['host']}/serving-endpoints/{ENDPOINT_NAME}/invocations"
+
+
+class LLMResult:
+    """Reply text plus the usage metadata recorded with saved analyses"""
+
+    __slots__ = (
+        "content", "model", "prompt_tokens", "completion_tokens", "latency_ms", "cached", "finish_reason",
+        "cached_prompt_tokens", "request_bytes", "response_bytes"
+    )
+
+    def __init__(self, content, model="", prompt_tokens=0, completion_tokens=0, latency_ms=0.0, cached=False,
+                 finish_reason="", cached_prompt_tokens=0, request_bytes=0, response_bytes=0):
+        self.content = content
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency_ms = latency_ms
+        self.cached = cached
+        self.finish_reason = finish_reason
+        # Prompt tokens served from the endpoint's prefix cache, when it reports them
+        self.cached_prompt_tokens = cached_prompt_tokens
+        # Body bytes sent and received for this call (0 when served from the response cache)
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+
+    @property
+    def truncated(self):
+        """True when generation stopped at max_tokens"""
+        return self.finish_reason == "length"
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def parse_response(response_json, latency_ms=0.0):
+    """Extract reply text and usage from a serving endpoint response"""
+    usage = response_json.get("usage") or {}
+    finish_reason = ""
+    if 'choices' in response_json:
+        content = response_json['choices'][0]['message']['content']
+        finish_reason = response_json['choices'][0].get('finish_reason') or ""
+    elif 'predictions' in response_json:
+        content = str(response_json['predictions'][0])
+    else:
+        content = str(response_json)
+    return LLMResult(
+        content,
+        model=response_json.get("model") or ENDPOINT_NAME,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        latency_ms=round(latency_ms, 1),
+        finish_reason=finish_reason,
+        cached_prompt_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    )
+
+
+def build_payload(messages, temperature, max_tokens, response_format=None, stop=None):
+    """Request payload with minimized messages, and the JSON size the unminimized one would have"""
+    payload = {
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    if response_format:
+        payload["response_format"] = response_format
+    if stop:
+        payload["stop"] = list(stop)
+    original_bytes = len(serializers.dumps(payload))
+    payload["messages"] = wire.minimize_messages(messages)
+    return payload, original_bytes
+
+
+def cached_result(cache, cache_key):
+    """LLMResult from the response cache, or None (also when the cache tier fails)"""
+    try:
+        hit = cache.get(cache_key)
+        if hit is None:
+            return None
+        return LLMResult(**dict(serializers.loads(hit), latency_ms=0.0, cached=True, request_bytes=0, response_bytes=0))
+    except Exception as e:
+        logger.warning("Response cache lookup failed (%s): %s", cache.name, e)
+        return None
+
+
+def cache_result(cache, cache_key, result):
+    """Store a result in the response cache; a failing cache tier is logged, not fatal"""
+    try:
+        cache.set(cache_key, serializers.dumps(result.to_dict()), ttl=RESPONSE_CACHE_TTL)
+    except Exception as e:
+        logger.warning("Response cache store failed (%s): %s", cache.name, e)
+
+
+def _post(config, payload, timeouts):
+    """POST a payload as a streamed request; returns (response, body size sent, uncompressed size)
+
+    A compressed body (LLM_REQUEST_COMPRESSION=gzip) answered with 415 or 400
+    is resent uncompressed; if that is accepted, the endpoint gets plain JSON
+    from then on.
+    """
+    body, headers, size = wire.encode_body(payload, config["host"])
+    response = get_session().post(
+        endpoint_url(config), headers=dict(config["headers"], **headers), data=body, timeout=timeouts, stream=True
+    )
+    if headers and response.status_code in (400, 415):
+        response.close()
+        body, _, size = wire.encode_body(payload, compression="none")
+        response = get_session().post(
+            endpoint_url(config), headers=config["headers"], data=body, timeout=timeouts, stream=True
+        )
+        if response.status_code not in (400, 415):
+            wire.reject_compression(config["host"])
+    return response, len(body), size
+
+
+def _received_bytes(response, decoded_bytes):
+    """Bytes the response body took on the wire (before content decoding) when the transport reports it"""
+    try:
+        return response.raw.tell() or decoded_bytes
+    except Exception:
+        return decoded_bytes
+
+
+def _record_bytes(result, original_bytes, minimized_bytes, sent_bytes, received_bytes):
+    result.request_bytes = sent_bytes
+    result.response_bytes = received_bytes
+    wire.get_meter().record(original_bytes, minimized_bytes, sent_bytes, received_bytes)
+
+
+def response_cache_key(config, payload):
+    digest = hashlib.sha256(endpoint_url(config).encode("utf-8"))
+    digest.update(serializers.dumps(payload))
+    return f"llm:{digest.hexdigest()}"
+
+
+class RequestHandle:
+    """An in-flight completion that can be waited on with a timeout or cancelled
+
+    Cancelling closes the response so the connection is dropped instead of
+    reading the rest of the body; a request still waiting for response headers
+    is abandoned and closed as soon as they arrive (bounded by the read timeout).
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._lock = threading.Lock()
+        # Set once the request either finished or was cancelled
+        self._settled = threading.Event()
+        self._cancelled = False
+        self._response = None
+        self._result = None
+        self._error = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def done(self):
+        return self._settled.is_set()
+
+    def cancel(self):
+        """Stop waiting for this request and drop its connection; False if it already finished"""
+        with self._lock:
+            if self._settled.is_set():
+                return False
+            self._cancelled = True
+            self._settled.set()
+            response = self._response
+        if response is not None:
+            response.close()
+        return True
+
+    def wait(self, timeout=None):
+        """Block up to timeout seconds (never past the deadline); True once finished or cancelled"""
+        if self.deadline is not None:
+            remaining = max(0.0, self.deadline - time.monotonic())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return self._settled.wait(timeout)
+
+    def result(self, timeout=None):
+        """Return the LLMResult; raises LLMCancelled, LLMTimeout or LLMError"""
+        if not self.wait(timeout):
+            if self.expired:
+                self.cancel()
+                raise LLMTimeout("API request timed out")
+            raise LLMTimeout(f"No result within {timeout:.1f}s")
+        if self._cancelled:
+            raise LLMCancelled("API request cancelled")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _attach(self, response):
+        """Remember the response so cancel() can close it; False if already cancelled"""
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._response = response
+            return True
+
+    def _finish(self, result=None, error=None):
+        with self._lock:
+            if self._settled.is_set():
+                return
+            self._result = result
+            self._error = error
+            self._response = None
+            self._settled.set()
+
+
+class CancelScope:
+    """Group of request handles cancelled together, e.g. all calls for one use case"""
+
+    def __init__(self, label=""):
+        self.label = label
+        self._handles = []
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    def submit(self, config, messages, **params):
+        handle = submit(config, messages, **params)
+        with self._lock:
+            self._handles = [h for h in self._handles if not h.done()]
+            self._handles.append(handle)
+            cancelled = self._cancelled
+        if cancelled:
+            handle.cancel()
+        return handle
+
+    def complete(self, config, messages, **params):
+        return self.submit(config, messages, **params).result()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for h in self._handles if not h.done())
+
+    def cancel(self):
+        """Cancel every pending request of the scope and any submitted later; returns how many"""
+        with self._lock:
+            self._cancelled = True
+            handles, self._handles = self._handles, []
+        return sum(1 for h in handles if h.cancel())
+
+
+def _perform(handle, *args):
+    """Worker body; whatever goes wrong settles the handle instead of leaving it to time out"""
+    try:
+        _request(handle, *args)
+    except Exception as e:
+        handle._finish(error=LLMError(f"API request failed: {e}"))
+
+
+def _request(handle, config, payload, cache, cache_key, timeouts, original_bytes):
+    if handle.cancelled:
+        return
+    start = time.perf_counter()
+    try:
+        response, sent_bytes, minimized_bytes = _post(config, payload, timeouts)
+    except Exception as e:
+        handle._finish(error=LLMError(f"API request failed: {e}"))
+        return
+
+    if not handle._attach(response):
+        response.close()
+        return
+    try:
+        # Read the body in chunks so a cancelled request stops downloading
+        chunks = []
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if handle.cancelled:
+                return
+            chunks.append(chunk)
+        body = b"".join(chunks)
+    except Exception as e:
+        handle._finish(error=LLMError(f"API request failed: {e}"))
+        return
+    finally:
+        response.close()
+
+    if response.status_code != 200:
+        text = body.decode(response.encoding or "utf-8", errors="replace")
+        handle._finish(error=LLMError(f"API call failed with status {response.status_code}: {text}"))
+        return
+    try:
+        result = parse_response(serializers.loads(body), (time.perf_counter() - start) * 1000)
+    except serializers.decode_errors() + MALFORMED_ERRORS as e:
+        handle._finish(error=LLMError(f"Invalid API response: {e!r}"))
+        return
+    _record_bytes(result, original_bytes, minimized_bytes, sent_bytes, _received_bytes(response, len(body)))
+    prefix_reuse.get_tracker().record_usage(result)
+    if cache:
+        cache_result(cache, cache_key, result)
+    handle._finish(result)
+
+
+def submit(config, messages, temperature=0.1, max_tokens=2048, response_format=None, use_cache=True, stop=None,
+           connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, timeout=REQUEST_TIMEOUT):
+    """Start a completion in the background and return its RequestHandle
+
+    stop is an optional list of stop sequences (see generation_policy.py).
+    connect_timeout/read_timeout apply per phase of the HTTP exchange;
+    timeout is the overall deadline enforced by RequestHandle.result().
+    Identical requests are answered from the shared cache tier (see
+    cache_backend.py) so workers never pay twice for the same completion.
+    """
+    if not config:
+        raise LLMError("Databricks configuration not initialized")
+
+    payload, original_bytes = build_payload(messages, temperature, max_tokens, response_format, stop)
+    handle = RequestHandle(timeout)
+    cache = cache_backend.get_cache() if use_cache else None
+    if cache is not None and cache.name == "none":
+        cache = None
+    cache_key = response_cache_key(config, payload) if cache else None
+    if cache:
+        result = cached_result(cache, cache_key)
+        if result is not None:
+            handle._finish(result)
+            return handle
+
+    prefix_reuse.get_tracker().record(payload["messages"])
+    get_executor().submit(
+        _perform, handle, config, payload, cache, cache_key, (connect_timeout, read_timeout), original_bytes
+    )
+    return handle
+
+
+def _stream_events(response):
+    """Decode a server-sent events body into its JSON data payloads"""
+    buffer = b""
+    for chunk in response.iter_content(CHUNK_SIZE):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    yield buffer
+
+
+def stream(config, messages, temperature=0.1, max_tokens=2048, response_format=None, use_cache=True, stop=None,
+           connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, timeout=REQUEST_TIMEOUT, cancel_event=None):
+    """Stream a completion: yields reply text deltas as they arrive, then the final LLMResult
+
+    Runs in the calling thread and shares the response cache with submit()
+    (a hit is yielded as a single delta). Setting cancel_event or passing
+    the overall timeout closes the connection and raises LLMCancelled or
+    LLMTimeout. Endpoints that ignore "stream" and answer with one JSON body
+    are handled too.
+    """
+    if not config:
+        raise LLMError("Databricks configuration not initialized")
+
+    payload, original_bytes = build_payload(messages, temperature, max_tokens, response_format, stop)
+    cache = cache_backend.get_cache() if use_cache else None
+    if cache is not None and cache.name == "none":
+        cache = None
+    cache_key = response_cache_key(config, payload) if cache else None
+    if cache:
+        result = cached_result(cache, cache_key)
+        if result is not None:
+            yield result.content
+            yield result
+            return
+
+    prefix_reuse.get_tracker().record(payload["messages"])
+    deadline = time.monotonic() + timeout if timeout else None
+    start = time.perf_counter()
+    try:
+        response, sent_bytes, minimized_bytes = _post(
+            config, dict(payload, stream=True), (connect_timeout, read_timeout)
+        )
+    except Exception as e:
+        raise LLMError(f"API request failed: {e}")
+
+    parts = []
+    raw = []
+    final = {}
+    decoded_bytes = 0
+    try:
+        for line in _stream_events(response):
+            decoded_bytes += len(line) + 1
+            if cancel_event is not None and cancel_event.is_set():
+                raise LLMCancelled("API request cancelled")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LLMTimeout("API request timed out")
+            if response.status_code != 200 or not line.startswith(b"data:"):
+                raw.append(line)
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                continue
+            event = serializers.loads(data)
+            choice = (event.get("choices") or [{}])[0]
+            delta = (choice.get("delta") or {}).get("content") or ""
+            final["finish_reason"] = choice.get("finish_reason") or final.get("finish_reason", "")
+            final["usage"] = event.get("usage") or final.get("usage")
+            final["model"] = event.get("model") or final.get("model")
+            if delta:
+                parts.append(delta)
+                yield delta
+    except LLMError:
+        raise
+    except serializers.decode_errors() as e:
+        raise LLMError(f"Invalid API response: {e}")
+    except Exception as e:
+        raise LLMError(f"API request failed: {e}")
+    finally:
+        response.close()
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    body = b"\n".join(raw)
+    if response.status_code != 200:
+        text = body.decode(response.encoding or "utf-8", errors="replace")
+        raise LLMError(f"API call failed with status {response.status_code}: {text}")
+    if parts or final or not body.strip():
+        result = parse_response({
+            "choices": [{"message": {"content": "".join(parts)}, "finish_reason": final.get("finish_reason")}],
+            "usage": final.get("usage"),
+            "model": final.get("model")
+        }, latency_ms)
+    else:
+        # Not an event stream: the endpoint sent the whole reply at once
+        try:
+            result = parse_response(serializers.loads(body), latency_ms)
+        except serializers.decode_errors() + MALFORMED_ERRORS as e:
+            raise LLMError(f"Invalid API response: {e!r}")
+        yield result.content
+    _record_bytes(result, original_bytes, minimized_bytes, sent_bytes, _received_bytes(response, decoded_bytes))
+    prefix_reuse.get_tracker().record_usage(result)
+    if cache:
+        cache_result(cache, cache_key, result)
+    yield result
+
+
+def complete(config, messages, temperature=0.1, max_tokens=2048, response_format=None, use_cache=True, **params):
+    """Call Databricks LLM using direct HTTP requests and return an LLMResult"""
+    return submit(config, messages, temperature, max_tokens, response_format, use_cache, **params).result()
+
+
+def call_databricks_llm(config, messages, temperature=0.1, max_tokens=2048):
+    """Call Databricks LLM and return only the reply text"""
+    return complete(config, messages, temperature, max_tokens).content
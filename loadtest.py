@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Load test - simulate N concurrent reviewers against the Streamlit app
+
+Each simulated reviewer is a headless Streamlit AppTest session that selects
+a use case, runs an analysis, asks follow-up questions and saves the review,
+all against a local mock LLM endpoint or a recorded cassette (see
+cassette.py). Sessions run in worker processes that share the JSON stores,
+like several app workers behind a load balancer.
+Reports p50/p95 interaction latency, lock contention on the JSON stores and
+memory growth per session.
+"""
+
+import os
+import time
+import json
+import random
+import shutil
+import resource
+import argparse
+import importlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import wire
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_run.py")
+FOLLOWUPS = (
+    "Which fields should the SPL extract to cover this better?",
+    "Would a lookup of privileged accounts reduce false positives?",
+    "Summarize the top change in one sentence."
+)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Serving-endpoint lookalike returning a canned reply after a fixed delay"""
+
+    latency = 0.5
+    reply_chars = 2000
+
+    def do_POST(self):
+        body = wire.decode_body(self.rfile.read(int(self.headers.get("Content-Length", 0))), self.headers)
+        time.sleep(self.latency)
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+        reply = ("Mock analysis. " * (self.reply_chars // 15 + 1))[:self.reply_chars]
+        out = json.dumps({
+            "model": "mock-llm",
+            "choices": [{"message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(reply) // 4}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_llm(latency, reply_chars, handler=MockLLMHandler):
+    """Start the mock endpoint on a free local port; returns the server"""
+    handler = type("ConfiguredMockLLMHandler", (handler,), {"latency": latency, "reply_chars": reply_chars})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def current_rss_kb():
+    """Resident set size of this process in KiB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        # Peak RSS is the best portable approximation (KiB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Finished sessions stay referenced, like open browser tabs, so their memory counts
+_open_sessions = []
+
+
+def run_session(session_id, followups, seed):
+    """One simulated reviewer: load, select, analyze, follow up, save
+
+    Runs inside a worker process (AppTest installs a process-global runtime,
+    so sessions cannot share a process concurrently). Returns timings,
+    exceptions, lock statistics and the session's RSS growth.
+    """
+    from streamlit.testing.v1 import AppTest
+    import review_store
+
+    rng = random.Random(seed + session_id)
+    timings = {}
+    errors = []
+    rss_before = current_rss_kb()
+
+    def timed_run(kind, action):
+        start = time.perf_counter()
+        at = action()
+        timings.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+        errors.extend(f"{kind}: {e.value}" for e in at.exception)
+        return at
+
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    timed_run("page load", at.run)
+    _open_sessions.append(at)
+
+    selector = at.selectbox(key="usecase_selected")
+    if selector.options:
+        timed_run("select", lambda: selector.select_index(rng.randrange(len(selector.options))).run())
+
+    analyze = [b for b in at.button if b.label == "Analyze Use Case"]
+    if analyze:
+        timed_run("analyze", lambda: analyze[0].click().run())
+        for question in followups:
+            if not [t for t in at.text_input if t.key == "followup_input"]:
+                errors.append("follow-up: chat input missing after analysis")
+                break
+            timed_run("follow-up", lambda: at.text_input(key="followup_input").input(question).run())
+        save = [b for b in at.button if b.label == "Save Analysis"]
+        if save:
+            timed_run("save", lambda: save[0].click().run())
+
+    return {
+        "timings": timings,
+        "errors": errors,
+        "rss_growth_kb": current_rss_kb() - rss_before,
+        "pid": os.getpid(),
+        "locks": review_store.lock_stats()
+    }
+
+
+def merge_lock_stats(results):
+    """Combine the latest lock statistics reported by each worker process"""
+    latest = {}
+    for result in results:
+        latest[result["pid"]] = result["locks"]
+    merged = {}
+    for stats_by_path in latest.values():
+        for path, stats in stats_by_path.items():
+            total = merged.setdefault(path, {"acquired": 0, "contended": 0, "wait_ms": 0.0, "max_wait_ms": 0.0})
+            total["acquired"] += stats["acquired"]
+            total["contended"] += stats["contended"]
+            total["wait_ms"] += stats["wait_ms"]
+            total["max_wait_ms"] = max(total["max_wait_ms"], stats["max_wait_ms"])
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent reviewers against the app")
+    parser.add_argument("--sessions", type=int, default=20, help="Total simulated reviewer sessions")
+    parser.add_argument("--concurrency", type=int, default=5, help="Sessions running at the same time")
+    parser.add_argument("--followups", type=int, default=2, help="Follow-up questions per session")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mock endpoint delay in seconds")
+    parser.add_argument("--reply-chars", type=int, default=2000, help="Mock reply length")
+    parser.add_argument("--cassette", help="Replay this recorded cassette instead of the mock endpoint")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Cassette timing multiplier (0 = no waits)")
+    parser.add_argument("--catalog", default="mitre_enriched_with_files.json", help="Catalog to serve")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = None
+    if args.cassette:
+        os.environ.update({
+            "LLM_CASSETTE": os.path.abspath(args.cassette),
+            "LLM_CASSETTE_MODE": "replay",
+            "LLM_CASSETTE_LATENCY_SCALE": str(args.latency_scale)
+        })
+        llm_label = f"cassette {args.cassette} at {args.latency_scale:g}x latency"
+    else:
+        server = start_mock_llm(args.llm_latency, args.reply_chars)
+        os.environ.update({
+            "DATABRICKS_TOKEN": "loadtest",
+            "DATABRICKS_HOST": f"http://127.0.0.1:{server.server_port}"
+        })
+        llm_label = f"mock LLM latency {args.llm_latency:.2f}s"
+    workdir = tempfile.mkdtemp(prefix="usecase-loadtest-")
+    os.environ.update({
+        "USECASE_CATALOG": os.path.abspath(args.catalog),
+        # Every simulated reviewer should reach the endpoint
+        "USECASE_CACHE_URL": "none"
+    })
+    os.chdir(workdir)
+
+    followups = [FOLLOWUPS[i % len(FOLLOWUPS)] for i in range(args.followups)]
+    start = time.perf_counter()
+    try:
+        # Worker processes inherit the environment and working directory set above.
+        # AppTest swaps sys.modules["__main__"] in workers, so submit by module name.
+        session_runner = importlib.import_module("loadtest").run_session
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.concurrency, mp_context=context) as pool:
+            futures = [pool.submit(session_runner, i, followups, args.seed) for i in range(args.sessions)]
+            results = [f.result() for f in futures]
+        wall = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    timings = {}
+    errors = []
+    for result in results:
+        for kind, values in result["timings"].items():
+            timings.setdefault(kind, []).extend(values)
+        errors.extend(result["errors"])
+
+    interactions = sum(len(v) for v in timings.values())
+    print(f"Sessions: {len(results)} ({args.concurrency} concurrent worker processes), {llm_label}")
+    print(f"Interactions: {interactions} in {wall:.1f}s ({interactions / wall:.1f}/s)\n")
+    print(f"{'interaction':<12}{'count':>7}{'p50':>10}{'p95':>10}{'max':>10}")
+    for kind, values in timings.items():
+        print(f"{kind:<12}{len(values):>7}{percentile(values, 50):>8.0f}ms"
+              f"{percentile(values, 95):>8.0f}ms{max(values):>8.0f}ms")
+
+    print("\nJSON store locks:")
+    for path, stats in merge_lock_stats(results).items():
+        print(f"  {path}: {stats['acquired']} acquisitions, {stats['contended']} contended, "
+              f"wait total {stats['wait_ms']:.1f}ms, max {stats['max_wait_ms']:.1f}ms")
+
+    growth = [result["rss_growth_kb"] for result in results]
+    print(f"\nMemory growth per session: p50 {percentile(growth, 50):.0f} KB, "
+          f"p95 {percentile(growth, 95):.0f} KB (first session per worker includes imports)")
+
+    if errors:
+        print(f"\n❌ {len(errors)} app exceptions, first: {errors[0]}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
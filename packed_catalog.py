@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Packed binary catalog - memory-mapped SPL/README bodies decoded on demand
+
+Layout (little endian):
+
+    b"UCPK" | u16 version | u16 file count | u64 header length
+    header JSON   {"files": [...], "techniques": {...}, "usecases": [[name, [ids]], ...]}
+    offset table  per use case and file: u64 offset into blob, u32 length
+    blob          UTF-8 file bodies back to back
+
+Only the header is parsed at load time. The bodies stay in the mapped file
+(shared through the OS page cache by every worker) and a body is decoded
+only when it is read, e.g. when it is displayed or put into a prompt.
+"""
+
+import os
+import mmap
+import struct
+import shutil
+import argparse
+import tempfile
+import weakref
+from collections.abc import Mapping
+
+import serializers
+from catalog import TechniqueTable, load_catalog
+
+MAGIC = b"UCPK"
+VERSION = 1
+FILES = ("search.spl", "drilldown.spl", "README.md")
+PREAMBLE = struct.Struct("<4sHHQ")
+SLOT = struct.Struct("<QI")
+MISSING = 0xFFFFFFFF
+
+
+def is_packed(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class LazyFiles(Mapping):
+    """Read-only files mapping whose bodies are decoded from the mmap on access"""
+
+    __slots__ = ("_pack", "_row")
+
+    def __init__(self, pack, row):
+        self._pack = pack
+        self._row = row
+
+    def __getitem__(self, filename):
+        body = self._pack.read_body(self._row, filename)
+        if body is None:
+            raise KeyError(filename)
+        return body
+
+    def __iter__(self):
+        return (f for f in self._pack.files if self._pack.has_body(self._row, f))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"LazyFiles({list(self)!r})"
+
+
+class PackedCatalog:
+    """An open packed catalog file, unmapped once nothing references it
+
+    Its use cases' files mappings reference it (and it does not reference
+    them), so the mapping lives exactly as long as any use case taken from it,
+    e.g. one a request is still working on after the catalog was reloaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._finalizer = weakref.finalize(self, _unmap, self._map, self._file)
+        magic, version, file_count, header_len = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} packed catalog")
+        header_start = PREAMBLE.size
+        header = serializers.loads(self._map[header_start:header_start + header_len])
+        self.files = tuple(header["files"])
+        self._file_slots = {name: idx for idx, name in enumerate(self.files)}
+        self._offsets_start = header_start + header_len
+        self._blob_start = self._offsets_start + len(header["usecases"]) * file_count * SLOT.size
+
+        self.technique_table = TechniqueTable.from_dict(header["techniques"])
+        self._usecases = header["usecases"]
+
+    def load_usecases(self):
+        """Use cases with lazily read files; not kept here, so they can outlive a reload"""
+        return {
+            name: {"techniques": tuple(technique_ids), "files": LazyFiles(self, row)}
+            for row, (name, technique_ids) in enumerate(self._usecases)
+        }
+
+    def _slot(self, row, filename):
+        column = self._file_slots.get(filename)
+        if column is None:
+            return 0, MISSING
+        return SLOT.unpack_from(self._map, self._offsets_start + (row * len(self.files) + column) * SLOT.size)
+
+    def has_body(self, row, filename):
+        return self._slot(row, filename)[1] != MISSING
+
+    def read_body(self, row, filename):
+        offset, length = self._slot(row, filename)
+        if length == MISSING:
+            return None
+        start = self._blob_start + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def close(self):
+        self._finalizer()
+
+
+def _unmap(mapping, file):
+    mapping.close()
+    file.close()
+
+
+def open_packed(path):
+    """Return (TechniqueTable, use cases) backed by a memory-mapped packed catalog"""
+    pack = PackedCatalog(path)
+    return pack.technique_table, pack.load_usecases()
+
+
+def write_packed(table, usecases, output_path):
+    """Write a packed catalog; bodies stream through a temporary blob file"""
+    header = {
+        "files": list(FILES),
+        "techniques": table.to_dict(),
+        "usecases": [[name, list(entry.get("techniques", ()))] for name, entry in usecases.items()]
+    }
+    offsets = bytearray()
+    directory = os.path.dirname(os.path.abspath(output_path))
+
+    with tempfile.TemporaryFile(dir=directory) as blob:
+        position = 0
+        for entry in usecases.values():
+            files = entry.get("files", {})
+            for filename in FILES:
+                body = files.get(filename)
+                if body is None:
+                    offsets += SLOT.pack(0, MISSING)
+                    continue
+                data = body.encode("utf-8")
+                blob.write(data)
+                offsets += SLOT.pack(position, len(data))
+                position += len(data)
+
+        header_bytes = serializers.dumps(header)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(PREAMBLE.pack(MAGIC, VERSION, len(FILES), len(header_bytes)))
+                out.write(header_bytes)
+                out.write(offsets)
+                blob.seek(0)
+                shutil.copyfileobj(blob, out)
+            # mkstemp creates the file owner-only; keep the mode a plain write would give
+            os.chmod(tmp_path, serializers.file_mode(output_path))
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return len(usecases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a JSON catalog to the packed memory-mapped format")
+    parser.add_argument("catalog", help="Catalog file in legacy or normalized JSON layout")
+    parser.add_argument("--output", required=True, help="Packed catalog file to write (e.g. catalog.ucpk)")
+    args = parser.parse_args()
+
+    table, usecases = load_catalog(args.catalog)
+    count = write_packed(table, usecases, args.output)
+    print(f"✅ Packed {count} use cases into {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Lightweight timing helpers - startup profile report and per-rerun traces
+
+Records how long each lazily initialized resource (config, HTTP client,
+catalog, ...) took to create, relative to process start, so cold start and
+rerun costs can be inspected from the app or the command line.
+
+With USECASE_PROFILE set, every rerun also records a trace: span() timers
+around the script's stages and around each LLM and disk call made from the
+script thread. A trace renders as a text waterfall and exports in the
+Chrome trace event format (chrome://tracing, Perfetto); with
+USECASE_TRACE_DIR set, each one is written there as a file. Durations per
+span name are also kept across reruns for p50/p95 figures.
+"""
+
+import os
+import time
+import importlib
+import threading
+import contextvars
+from collections import deque
+from functools import wraps
+from contextlib import contextmanager
+
+PROCESS_START = time.perf_counter()
+TRACING = bool(os.getenv("USECASE_PROFILE"))
+TRACE_DIR = os.getenv("USECASE_TRACE_DIR")
+SPAN_WINDOW = 500
+
+_lock = threading.Lock()
+_startup_events = []
+_span_history = {}
+_current_trace = contextvars.ContextVar("perf_trace", default=None)
+
+
+@contextmanager
+def timed(label):
+    """Record the duration of a one-off startup phase"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            _startup_events.append({
+                "phase": label,
+                "started_ms": round((start - PROCESS_START) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2)
+            })
+
+
+def startup_report():
+    """Return recorded startup phases in the order they started"""
+    with _lock:
+        return sorted(_startup_events, key=lambda e: e["started_ms"])
+
+
+def format_startup_report():
+    lines = [f"{'phase':<20}{'start':>10}{'duration':>12}"]
+    for event in startup_report():
+        lines.append(f"{event['phase']:<20}{event['started_ms']:>8.1f}ms{event['duration_ms']:>10.1f}ms")
+    return "\n".join(lines)
+
+
+class Trace:
+    """Spans recorded during one rerun, in start order"""
+
+    def __init__(self, label="rerun"):
+        self.label = label
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self.duration_ms = None
+        self._depth = 0
+
+    @property
+    def finished(self):
+        return self.duration_ms is not None
+
+    def finish(self):
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self.start) * 1000, 2)
+        return self
+
+
+def start_trace(label="rerun"):
+    """Begin tracing the current thread's run; None when profiling is off"""
+    if not TRACING:
+        return None
+    trace = Trace(label)
+    _current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name, category="stage"):
+    """Time a block into the current trace (a no-op outside a traced run)"""
+    trace = _current_trace.get()
+    if trace is None or trace.finished:
+        yield
+        return
+    record = {"name": name, "category": category, "depth": trace._depth}
+    trace.spans.append(record)
+    trace._depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        trace._depth -= 1
+        record["start_ms"] = round((start - trace.start) * 1000, 2)
+        record["duration_ms"] = round((end - start) * 1000, 2)
+        with _lock:
+            history = _span_history.get(name)
+            if history is None:
+                history = _span_history[name] = deque(maxlen=SPAN_WINDOW)
+            history.append(record["duration_ms"])
+
+
+def traced(name, category="stage"):
+    """Decorator form of span(); leaves func untouched when profiling is off"""
+    def decorate(func):
+        if not TRACING:
+            return func
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def span_stats():
+    """Per span name over recent reruns: count, p50 and p95 milliseconds"""
+    with _lock:
+        history = {name: list(values) for name, values in _span_history.items()}
+    return {
+        name: {"count": len(values), "p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+        for name, values in history.items()
+    }
+
+
+def format_waterfall(trace, width=40):
+    """Text waterfall of a trace: one bar per span on a shared time axis"""
+    total = trace.duration_ms or max((s["start_ms"] + s["duration_ms"] for s in trace.spans), default=0.0)
+    scale = width / total if total else 0
+    lines = [f"{trace.label}: {total:.1f} ms, {len(trace.spans)} spans"]
+    for record in trace.spans:
+        if "duration_ms" not in record:
+            continue  # still open, e.g. the block rendering this waterfall
+        offset = int(record["start_ms"] * scale)
+        bar = "█" * max(1, int(record["duration_ms"] * scale))
+        label = ("  " * record["depth"] + record["name"])[:24]
+        lines.append(f"{label:<24}{record['duration_ms']:>9.1f}ms |{' ' * offset}{bar}".rstrip())
+    return "\n".join(lines)
+
+
+def format_span_stats(stats):
+    lines = [f"{'span':<24}{'count':>7}{'p50':>10}{'p95':>10}"]
+    for name, values in sorted(stats.items(), key=lambda item: item[1]["p95"], reverse=True):
+        lines.append(f"{name[:24]:<24}{values['count']:>7}{values['p50']:>8.1f}ms{values['p95']:>8.1f}ms")
+    return "\n".join(lines)
+
+
+def chrome_trace(trace, pid=None):
+    """Trace events (complete "X" events in microseconds) for chrome://tracing or Perfetto"""
+    pid = os.getpid() if pid is None else pid
+    base_us = trace.started_at * 1e6
+    events = [{
+        "name": trace.label, "cat": "rerun", "ph": "X", "pid": pid, "tid": 0,
+        "ts": round(base_us, 1), "dur": round((trace.duration_ms or 0.0) * 1000, 1)
+    }]
+    for record in trace.spans:
+        if "duration_ms" not in record:
+            continue
+        events.append({
+            "name": record["name"], "cat": record["category"], "ph": "X", "pid": pid, "tid": 0,
+            "ts": round(base_us + record["start_ms"] * 1000, 1), "dur": round(record["duration_ms"] * 1000, 1)
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(trace, directory=TRACE_DIR, name=None):
+    """Write a trace file into directory; returns its path (None without a directory)"""
+    if not directory:
+        return None
+    import serializers
+
+    os.makedirs(directory, exist_ok=True)
+    name = name or f"trace-{int(trace.started_at * 1000)}-{os.getpid()}-{threading.get_ident()}.json"
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(serializers.dumps(chrome_trace(trace)))
+    return path
+
+
+def main():
+    """Print a cold start profile: heavy imports plus first catalog load"""
+    # Record into the importable module, not __main__, so library timings land too
+    profile = importlib.import_module("perf")
+    for module in ("streamlit", "requests", "catalog", "llm_client", "review_store"):
+        with profile.timed(f"import {module}"):
+            importlib.import_module(module)
+    importlib.import_module("catalog").get_catalog()
+    importlib.import_module("llm_client").get_config()
+    print(profile.format_startup_report())
+
+
+if __name__ == "__main__":
+    main()
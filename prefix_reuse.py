@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Prompt prefix reuse - how much of each request repeats an earlier request's prefix
+
+Serving stacks with prefix (KV) caching skip the prompt prefix they have
+already computed, which cuts time to first token. Only the leading run of
+identical content counts, so requests are cut into fixed-size blocks chained
+by hash, as those caches do; a block is reused when the same chain was sent
+before. llm_client records every request sent to the endpoint, together
+with the cached prompt tokens the endpoint reports, if any.
+
+The CLI replays the message layout of a batch run (analysis, fan-out and
+follow-ups) over the catalog and reports the reuse each kind of request gets.
+"""
+
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+
+BLOCK_CHARS = 256  # roughly 64 tokens, a typical KV cache block multiple
+MAX_BLOCKS = 200_000
+
+
+def serialize(messages):
+    """Prompt text in request order, with role markers as chat templates insert them"""
+    return "".join(f"<|{m['role']}|>\n{m['content']}\n" for m in messages)
+
+
+def block_chain(text, block_chars=BLOCK_CHARS):
+    """Hash of every full leading block, each chained to the blocks before it"""
+    digest = hashlib.sha1()
+    hashes = []
+    for start in range(0, len(text) - block_chars + 1, block_chars):
+        digest.update(text[start:start + block_chars].encode("utf-8"))
+        hashes.append(digest.copy().digest())
+    return hashes
+
+
+class PrefixTracker:
+    """Bounded LRU of seen block chains plus reuse totals per request kind"""
+
+    def __init__(self, max_blocks=MAX_BLOCKS, block_chars=BLOCK_CHARS):
+        self.max_blocks = max_blocks
+        self.block_chars = block_chars
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, messages, kind="request"):
+        """Record one request; returns the number of leading characters seen before"""
+        text = serialize(messages)
+        chain = block_chain(text, self.block_chars)
+        with self._lock:
+            reused = 0
+            for block in chain:
+                if block not in self._blocks:
+                    break
+                reused += 1
+            for block in chain:
+                self._blocks[block] = None
+                self._blocks.move_to_end(block)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+            totals = self._totals.setdefault(kind, {"requests": 0, "chars": 0, "reused_chars": 0})
+            totals["requests"] += 1
+            totals["chars"] += len(text)
+            totals["reused_chars"] += reused * self.block_chars
+        return reused * self.block_chars
+
+    def record_usage(self, result, kind="request"):
+        """Add the endpoint's own prompt/cached token counts from an LLMResult"""
+        with self._lock:
+            totals = self._totals.setdefault(kind, {"requests": 0, "chars": 0, "reused_chars": 0})
+            totals["prompt_tokens"] = totals.get("prompt_tokens", 0) + result.prompt_tokens
+            totals["cached_tokens"] = totals.get("cached_tokens", 0) + result.cached_prompt_tokens
+
+    def stats(self):
+        with self._lock:
+            return {kind: dict(totals) for kind, totals in self._totals.items()}
+
+
+def format_stats(stats):
+    lines = [f"{'request':<12}{'count':>7}{'prompt chars':>14}{'reused':>9}{'endpoint cached':>17}"]
+    for kind, totals in stats.items():
+        ratio = totals["reused_chars"] / totals["chars"] if totals["chars"] else 0.0
+        endpoint = "-"
+        if totals.get("prompt_tokens"):
+            endpoint = f"{totals.get('cached_tokens', 0) / totals['prompt_tokens']:.0%}"
+        lines.append(f"{kind:<12}{totals['requests']:>7}{totals['chars']:>14}{ratio:>9.0%}{endpoint:>17}")
+    return "\n".join(lines)
+
+
+_lock = threading.Lock()
+_tracker = None
+
+
+def get_tracker():
+    """Process-wide tracker fed by llm_client"""
+    global _tracker
+    if _tracker is None:
+        with _lock:
+            if _tracker is None:
+                _tracker = PrefixTracker()
+    return _tracker
+
+
+def simulate_batch(technique_table, usecases, limit, followups=3, reply_chars=2000):
+    """Replay a batch run's request layout; returns a PrefixTracker with the totals"""
+    import prompts
+
+    tracker = PrefixTracker()
+    reply = ("Simulated review text. " * (reply_chars // 23 + 1))[:reply_chars]
+    for name in sorted(usecases)[:limit]:
+        entry = usecases[name]
+        techniques = technique_table.resolve(entry.get("techniques", ()))
+        if not techniques:
+            continue
+        prompt = prompts.build_default_prompt(techniques, entry)
+        tracker.record(prompts.build_analysis_messages(prompt), "analysis")
+        for technique in techniques:
+            tracker.record(prompts.build_analysis_messages(prompts.build_default_prompt([technique], entry)), "fan-out")
+        history = [{"role": "assistant", "content": reply}]
+        for turn in range(followups):
+            history.append({"role": "user", "content": f"Follow-up question {turn} about {name}?"})
+            tracker.record(prompts.build_followup_messages(history, prompt), "follow-up")
+            history.append({"role": "assistant", "content": reply})
+    return tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt prefix reuse of a simulated batch run")
+    parser.add_argument("--catalog", default="mitre_enriched_with_files.json", help="Catalog to replay")
+    parser.add_argument("--limit", type=int, default=200, help="Number of use cases")
+    parser.add_argument("--followups", type=int, default=3, help="Follow-up turns per use case")
+    args = parser.parse_args()
+
+    from catalog import load_catalog
+
+    technique_table, usecases = load_catalog(args.catalog)
+    tracker = simulate_batch(technique_table, usecases, args.limit, args.followups)
+    print(f"Block size {BLOCK_CHARS} chars; reused = leading blocks already sent in this run\n")
+    print(format_stats(tracker.stats()))
+
+
+if __name__ == "__main__":
+    main()
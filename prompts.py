@@ -0,0 +1,107 @@
+"""
+Prompt and message assembly for use case reviews
+
+Messages are laid out from most to least shared so serving-side prefix
+caching can reuse earlier work: the same system message (with the review
+instructions) for every request, then the use case's files, then its
+techniques, then per-turn content. A follow-up request repeats the
+analysis request verbatim and appends to it.
+"""
+
+import wire
+
+SYSTEM_PROMPT = (
+    "You are a security-focused assistant. "
+    "Review the provided SPL and drill-down SPL queries against the MITRE ATT&CK techniques "
+    "and describe any coverage gaps.\n\n"
+    "For each technique:\n"
+    "1. What is not covered by the SPL query for detecting this technique?\n"
+    "2. Identify any mistakes or gaps.\n"
+    "3. Suggest specific changes needed.\n"
+    "4. Provide recommendations for improving detection coverage.\n\n"
+    "Start each technique's section with a heading like '### Technique 1: <ID> <name>'. "
+    "Answer follow-up questions in the context of this review."
+)
+
+
+def usecase_files(entry):
+    """Return (spl, drilldown, readme) with the UI's placeholder text for missing files"""
+    files = entry.get("files", {})
+    return (
+        files.get("search.spl") or "No SPL available",
+        files.get("drilldown.spl") or "No drill down query available",
+        files.get("README.md") or "No README available"
+    )
+
+
+def build_techniques_info(techniques):
+    techniques_info = ""
+    for idx, t in enumerate(techniques, 1):
+        techniques_info += (
+            f"### Technique {idx}\n"
+            f"ID: {t.ID}\n"
+            f"Name: {t.name}\n"
+            f"Description: {t.description}\n"
+            f"Tactics: {t.tactics}\n"
+            f"Platforms: {t.platforms}\n\n"
+        )
+    return techniques_info
+
+
+def build_files_info(entry):
+    """File block of a prompt, with whitespace and README markup normalized (see wire.py)"""
+    spl_query, drilldown_query, readme = usecase_files(entry)
+    spl_query = wire.normalize_whitespace(spl_query)
+    drilldown_query = wire.normalize_whitespace(drilldown_query)
+    readme = wire.normalize_markdown(readme)
+    return (
+        f"### SPL Query\n{spl_query}\n\n"
+        f"### Drill-down SPL Query\n{drilldown_query}\n\n"
+        f"### README Context\n{readme}\n\n"
+    )
+
+
+def build_default_prompt(techniques, entry):
+    """Default editable review prompt for one use case
+
+    Files come before techniques so per-technique and retry prompts for the
+    same use case share the file block; the instructions are in SYSTEM_PROMPT.
+    """
+    return (
+        f"{build_files_info(entry)}"
+        f"{build_techniques_info(techniques)}"
+        "Review the SPL above against each of these techniques."
+    )
+
+
+def build_analysis_messages(user_prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def build_followup_messages(conversation_history, analysis_prompt=None):
+    """The analysis request followed by its reply and the user/assistant turns
+
+    Each follow-up extends the previous request unchanged. Without the
+    original prompt the analysis is carried in the system message instead.
+    """
+    if not analysis_prompt:
+        system_msg = {
+            "role": "system",
+            "content": f"{SYSTEM_PROMPT} Original analysis: {conversation_history[0]['content']}"
+        }
+        return [system_msg] + list(conversation_history[1:])
+    return build_analysis_messages(analysis_prompt) + list(conversation_history)
+
+
+def format_conversation(conversation_history, final_review=""):
+    """Markdown transcript saved as the analysis text"""
+    full_conversation = "\n\n".join([
+        f"**{msg['role'].title()}:** {msg['content']}"
+        for msg in conversation_history
+    ])
+    if final_review.strip():
+        full_conversation += f"\n\n**Final Review:**\n{final_review}"
+    return full_conversation
@@ -0,0 +1,113 @@
+"""
+Diff-aware re-review of a changed use case
+
+Instead of a full analysis with the complete prompt, a re-review sends the
+unified diff between the SPL/README snapshot saved with the prior analysis
+and the current files, plus a compact summary of the previous findings.
+The reply says which findings the change resolves, which remain and what
+the change introduced; it is saved as the next version of the analysis.
+"""
+
+import re
+import difflib
+
+import prompts
+import generation_policy
+
+FILES = ("search.spl", "drilldown.spl", "README.md")
+CONTEXT_LINES = 2
+ITEM_CHARS = 240
+ITEM_TITLES = ("Not covered", "Mistakes", "Suggested changes", "Recommendations")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def snapshot(entry):
+    """File bodies saved with an analysis so later versions can be diffed against it"""
+    files = entry.get("files", {})
+    return {filename: files.get(filename) or "" for filename in FILES}
+
+
+def diff_files(old_snapshot, entry, context=CONTEXT_LINES):
+    """Unified diff per changed file ({filename: diff text}); empty if nothing changed"""
+    current = snapshot(entry)
+    diffs = {}
+    for filename in FILES:
+        before = old_snapshot.get(filename, "")
+        after = current[filename]
+        if before == after:
+            continue
+        lines = difflib.unified_diff(
+            before.splitlines(), after.splitlines(),
+            f"previous/{filename}", f"current/{filename}", n=context, lineterm=""
+        )
+        diffs[filename] = "\n".join(lines)
+    return diffs
+
+
+def _shorten(text, limit=ITEM_CHARS):
+    text = " ".join(text.split())
+    first = SENTENCE_RE.split(text, 1)[0]
+    return first if len(first) <= limit else first[:limit - 3].rstrip() + "..."
+
+
+def summarize_findings(record, techniques):
+    """Compact per-technique summary of a saved analysis (structured result preferred)"""
+    lines = []
+    structured = record.get("structured")
+    if structured and structured.get("techniques"):
+        import structured_output
+
+        for item in structured["techniques"]:
+            lines.append(f"- {item['technique_id']}")
+            for field, title in zip(structured_output.FIELDS, ITEM_TITLES):
+                values = [_shorten(v) for v in item.get(field, [])]
+                if values:
+                    lines.append(f"  - {title}: " + "; ".join(values))
+        return "\n".join(lines)
+
+    # Imported here so the app does not load pyarrow until a re-review runs
+    import export_analyses
+
+    text = export_analyses.initial_analysis(record.get("analysis", ""))
+    sections = export_analyses.split_technique_sections(text, [t.ID for t in techniques])
+    for technique in techniques:
+        items = export_analyses.section_items(sections.get(technique.ID, ""))
+        lines.append(f"- {technique.ID} {technique.name}".rstrip())
+        for number, title in enumerate(ITEM_TITLES, 1):
+            if items.get(number):
+                finding = export_analyses.LABEL_RE.sub("", items[number], count=1)
+                lines.append(f"  - {title}: {_shorten(finding)}")
+    if not any(line.startswith("  ") for line in lines):
+        # No numbered findings to pick out; fall back to the reply's opening
+        return f"- {_shorten(text, ITEM_CHARS * 4)}"
+    return "\n".join(lines)
+
+
+def build_rereview_prompt(techniques, diffs, summary):
+    technique_list = "\n".join(f"- {t.ID} {t.name}".rstrip() for t in techniques)
+    changes = "\n\n".join(f"```diff\n{diff}\n```" for diff in diffs.values())
+    return (
+        "This use case was reviewed before and has since changed.\n\n"
+        f"### Techniques\n{technique_list}\n\n"
+        f"### Previous findings\n{summary}\n\n"
+        f"### Changes since the previous review\n{changes}\n\n"
+        "For each technique, say which previous findings these changes resolve, which still apply, "
+        "and any new gaps or mistakes the changes introduce. Only discuss what the changes affect."
+    )
+
+
+def run_rereview(complete, techniques, entry, record):
+    """Re-review the changes since record; returns (markdown, prompt, LLMResult)
+
+    Raises ValueError when the record has no snapshot or nothing changed.
+    """
+    if not record or not record.get("snapshot"):
+        raise ValueError("The saved analysis has no file snapshot; run a full analysis instead")
+    diffs = diff_files(record["snapshot"], entry)
+    if not diffs:
+        raise ValueError("The SPL and README are unchanged since the saved analysis")
+    prompt = build_rereview_prompt(techniques, diffs, summarize_findings(record, techniques))
+    result = generation_policy.run(
+        complete, prompts.build_analysis_messages(prompt), generation_policy.REREVIEW, len(techniques)
+    )
+    return result.content, prompt, result
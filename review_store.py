@@ -0,0 +1,224 @@
+"""
+Persistent review stores - reviewed use case set and saved analyses
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import perf
+import serializers
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no inter-process locking on this platform
+
+REVIEWED_PATH = "reviewed_usecases.json"
+ANALYSES_PATH = "usecase_analyses.json"
+DRAFTS_PATH = "usecase_drafts.json"
+DRAFT_TTL = 7 * 24 * 3600
+MAX_VERSIONS = 10
+
+
+_stats_lock = threading.Lock()
+_lock_stats = {}
+
+
+@contextmanager
+def locked(path):
+    """Exclusive inter-process lock around a read-modify-write of a JSON store
+
+    Wait times are recorded per store so contention can be measured (see
+    lock_stats() and loadtest.py).
+    """
+    start = time.perf_counter()
+    contended = False
+    with open(f"{path}.lock", "a") as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                contended = True
+                with perf.span("lock wait", "disk"):
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        waited_ms = (time.perf_counter() - start) * 1000
+        with _stats_lock:
+            stats = _lock_stats.setdefault(path, {"acquired": 0, "contended": 0, "wait_ms": 0.0, "max_wait_ms": 0.0})
+            stats["acquired"] += 1
+            stats["contended"] += contended
+            stats["wait_ms"] += waited_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], waited_ms)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def lock_stats():
+    """Per-store lock acquisitions, contended acquisitions and wait times in this process"""
+    with _stats_lock:
+        return {path: dict(stats) for path, stats in _lock_stats.items()}
+
+
+@perf.traced("read reviewed set", "disk")
+def load_reviewed_usecases(path=REVIEWED_PATH):
+    try:
+        return set(serializers.load_file(path))
+    except FileNotFoundError:
+        return set()
+
+
+@perf.traced("write reviewed set", "disk")
+def save_reviewed_usecases(reviewed_set, path=REVIEWED_PATH):
+    with locked(path):
+        serializers.dump_file(path, sorted(reviewed_set))
+
+
+@perf.traced("mark reviewed", "disk")
+def mark_reviewed(usecase_name, path=REVIEWED_PATH):
+    """Add one use case to the reviewed set without dropping other sessions' marks"""
+    with locked(path):
+        reviewed = load_reviewed_usecases(path)
+        reviewed.add(usecase_name)
+        serializers.dump_file(path, sorted(reviewed))
+    return reviewed
+
+
+_reviewed_snapshots = {}
+
+
+def reviewed_snapshot(path=REVIEWED_PATH):
+    """Reviewed set shared by all sessions of this process, re-read only when the file changes"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return frozenset()
+    cached = _reviewed_snapshots.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _reviewed_snapshots[path] = (mtime, frozenset(load_reviewed_usecases(path)))
+    return cached[1]
+
+
+@perf.traced("read analyses", "disk")
+def load_analyses(path=ANALYSES_PATH):
+    """Load all saved analyses"""
+    if not os.path.exists(path):
+        return {}
+    return serializers.load_file(path)
+
+
+@perf.traced("save analysis", "disk")
+def save_analysis(usecase_name, analysis_text, content_hash="", metadata=None, snapshot=None, path=ANALYSES_PATH):
+    """Save analysis result to JSON file with usecase name as key
+
+    content_hash records which SPL/README version was reviewed so the
+    selector can flag the review as stale once the detection changes;
+    snapshot keeps those file bodies so a later re-review can diff them.
+    metadata carries model, token usage and latency for reporting.
+    The record replaced by a save is kept under "versions" (up to MAX_VERSIONS).
+    """
+    record = {
+        "analysis": analysis_text,
+        "timestamp": datetime.now().isoformat(),
+        "content_hash": content_hash
+    }
+    if snapshot is not None:
+        record["snapshot"] = snapshot
+    record.update(metadata or {})
+    with locked(path):
+        analyses = load_analyses(path)
+        previous = analyses.get(usecase_name)
+        record["version"] = 1
+        if previous:
+            versions = previous.pop("versions", [])
+            versions.append(previous)
+            record["versions"] = versions[-MAX_VERSIONS:]
+            record["version"] = previous.get("version", 1) + 1
+        analyses[usecase_name] = record
+        serializers.dump_file(path, analyses, pretty=True)
+    return record["version"]
+
+
+def load_analysis(usecase_name, path=ANALYSES_PATH):
+    """The latest saved record for one use case, or None"""
+    return load_analyses(path).get(usecase_name)
+
+
+_review_hashes = {}
+
+
+def load_review_hashes(path=ANALYSES_PATH):
+    """Map of use case name -> reviewed content hash, re-read only when the file changes"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _review_hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        hashes = {
+            name: record.get("content_hash", "")
+            for name, record in load_analyses(path).items()
+        }
+        cached = _review_hashes[path] = (mtime, hashes)
+    return cached[1]
+
+
+@perf.traced("read drafts", "disk")
+def _load_drafts(path):
+    try:
+        return serializers.load_file(path)
+    except FileNotFoundError:
+        return {}
+
+
+def _draft_key(session_id, usecase_name):
+    return f"{session_id}/{usecase_name}"
+
+
+def load_draft(session_id, usecase_name, path=DRAFTS_PATH):
+    """Offloaded conversation of one session and use case: {"archived": [...], "history": [...]}"""
+    return _load_drafts(path).get(_draft_key(session_id, usecase_name), {})
+
+
+@perf.traced("update draft", "disk")
+def update_draft(session_id, usecase_name, archived=(), history=None, prompt=None, meta=None, usage=None,
+                 structured=None, path=DRAFTS_PATH):
+    """Append archived turns and/or replace the parked history (with its analysis prompt, meta, usage and
+    structured result) of a draft
+
+    structured is replaced along with history, so a parked analysis without
+    one does not inherit an earlier one. Drafts not touched for DRAFT_TTL
+    seconds (closed tabs) are dropped on write.
+    """
+    key = _draft_key(session_id, usecase_name)
+    now = time.time()
+    with locked(path):
+        drafts = _load_drafts(path)
+        drafts = {k: d for k, d in drafts.items() if now - d.get("updated", 0) < DRAFT_TTL}
+        draft = drafts.setdefault(key, {"archived": [], "history": []})
+        draft["archived"].extend(archived)
+        if history is not None:
+            draft["history"] = list(history)
+            draft["structured"] = structured
+        if prompt is not None:
+            draft["prompt"] = prompt
+        if meta is not None:
+            draft["meta"] = meta
+        if usage is not None:
+            draft["usage"] = usage
+        draft["updated"] = now
+        serializers.dump_file(path, drafts)
+
+
+@perf.traced("delete draft", "disk")
+def delete_draft(session_id, usecase_name, path=DRAFTS_PATH):
+    if not os.path.exists(path):
+        return
+    with locked(path):
+        drafts = _load_drafts(path)
+        if drafts.pop(_draft_key(session_id, usecase_name), None) is not None:
+            serializers.dump_file(path, drafts)
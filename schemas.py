@@ -0,0 +1,53 @@
+"""
+Typed schemas for catalog and analysis files
+
+With msgspec installed these are Structs that JSON decodes straight into;
+without it they are None and callers fall back to plain dicts of the same shape.
+"""
+
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if msgspec is not None:
+    class TechniqueRecord(msgspec.Struct):
+        name: str = ""
+        description: str = ""
+        tactics: str = ""
+        platforms: str = ""
+
+    class UseCase(msgspec.Struct):
+        techniques: List[str] = []
+        # Legacy catalogs mark a missing file with null
+        files: Dict[str, Optional[str]] = {}
+
+    class Catalog(msgspec.Struct):
+        """Normalized catalog layout (catalog_version 2)"""
+        catalog_version: int
+        usecases: Dict[str, UseCase] = {}
+        techniques: Dict[str, TechniqueRecord] = {}
+
+    class Analysis(msgspec.Struct):
+        """One saved review in usecase_analyses.json"""
+        analysis: str
+        timestamp: str
+        content_hash: str = ""
+        model: str = ""
+        prompt_tokens: int = 0
+        completion_tokens: int = 0
+        latency_ms: float = 0.0
+        llm_calls: int = 0
+        structured: Optional[Dict[str, Any]] = None
+        mode: str = "full"
+        version: int = 1
+        base_version: int = 0
+        snapshot: Optional[Dict[str, str]] = None
+        versions: List["Analysis"] = []
+
+    Analyses = Dict[str, Analysis]
+else:
+    TechniqueRecord = UseCase = Catalog = Analysis = Analyses = None
@@ -0,0 +1,149 @@
+"""
+Pluggable JSON serialization for catalog and analysis files
+
+Uses orjson or msgspec when installed and falls back to the stdlib json module.
+Set JSON_BACKEND=json|orjson|msgspec to force a specific backend.
+"""
+
+import os
+import json
+import stat
+import tempfile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Read once at import: setting the umask to read it is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class StdlibBackend:
+    name = "json"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonBackend:
+    name = "orjson"
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+
+class MsgspecBackend:
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+    def dumps(self, obj, pretty=False):
+        encoded = self._encoder.encode(obj)
+        if pretty:
+            return msgspec.json.format(encoded, indent=2)
+        return encoded
+
+
+def available_backends():
+    """Return the names of all usable backends, fastest first"""
+    names = []
+    if orjson is not None:
+        names.append("orjson")
+    if msgspec is not None:
+        names.append("msgspec")
+    names.append("json")
+    return names
+
+
+_BACKEND_CLASSES = {"json": StdlibBackend, "orjson": OrjsonBackend, "msgspec": MsgspecBackend}
+_backends = {}
+
+
+def get_backend(name=None):
+    """Return a (cached) backend instance by name, or the preferred one"""
+    name = name or os.getenv("JSON_BACKEND") or available_backends()[0]
+    if name not in available_backends():
+        name = "json"
+    if name not in _backends:
+        _backends[name] = _BACKEND_CLASSES[name]()
+    return _backends[name]
+
+
+def decode_errors():
+    """Exception types raised for malformed JSON by any available backend"""
+    errors = (ValueError,)
+    if msgspec is not None:
+        errors += (msgspec.DecodeError,)
+    return errors
+
+
+def loads(data, backend=None):
+    return get_backend(backend).loads(data)
+
+
+def dumps(obj, pretty=False, backend=None):
+    """Serialize to UTF-8 encoded JSON bytes"""
+    return get_backend(backend).dumps(obj, pretty=pretty)
+
+
+def decode(data, type=None, backend=None):
+    """Decode JSON, straight into typed structs when msgspec is installed"""
+    if type is not None and msgspec is not None:
+        return msgspec.json.decode(data, type=type)
+    return loads(data, backend=backend)
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_file(path, type=None, backend=None):
+    return decode(read_bytes(path), type=type, backend=backend)
+
+
+def file_mode(path):
+    """Permissions for a rewritten file: the existing file's, else the umask default"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def dump_file(path, obj, pretty=False, backend=None):
+    """Write JSON atomically so readers never observe a half-written file"""
+    data = dumps(obj, pretty=pretty, backend=backend)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path), suffix=".tmp",
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file owner-only; keep the mode a plain write would give
+        os.chmod(tmp_path, file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
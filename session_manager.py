@@ -0,0 +1,187 @@
+"""
+Bounded per-session state for long-lived browser tabs
+
+A reviewer may keep one tab open for hundreds of use cases. Only the
+conversation of the selected use case stays in memory, capped at
+MAX_HISTORY_MESSAGES: older follow-up turns are archived to the draft store
+and conversations of use cases the reviewer moved away from are parked
+there until they are selected again. Saving a review deletes its draft.
+
+Works on any mapping with the st.session_state keys used by the app.
+"""
+
+import os
+import sys
+import uuid
+
+import llm_client
+import review_store
+
+MAX_HISTORY_MESSAGES = int(os.getenv("USECASE_MAX_HISTORY", "41"))
+# Trim in chunks so the draft store is not rewritten after every follow-up;
+# whole user/assistant turns, so the count is even
+KEEP_MESSAGES = max(2, MAX_HISTORY_MESSAGES // 4 * 2)
+
+
+def init(state):
+    state.setdefault("session_id", uuid.uuid4().hex)
+    state.setdefault("conversation_history", [])
+    state.setdefault("archived_turns", 0)
+    # Prompt of the initial analysis; follow-up requests repeat it as their prefix
+    state.setdefault("analysis_prompt", None)
+    # Saved with the review, e.g. {"mode": "rereview", "base_version": 2}
+    state.setdefault("analysis_meta", {})
+    # Use cases with a parked conversation in the draft store
+    state.setdefault("parked_usecases", set())
+
+
+def _has_conversation(state):
+    return state.get("has_current_analysis", False) and bool(state["conversation_history"])
+
+
+def start(state, usecase_name, analysis, prompt=None, meta=None):
+    """Begin a new conversation, discarding any earlier draft for the use case"""
+    if state["archived_turns"] or usecase_name in state["parked_usecases"]:
+        review_store.delete_draft(state["session_id"], usecase_name)
+        state["parked_usecases"].discard(usecase_name)
+    state["conversation_history"] = [{"role": "assistant", "content": analysis}]
+    state["analysis_prompt"] = prompt
+    state["analysis_meta"] = meta or {"mode": "full"}
+    state["archived_turns"] = 0
+    state["current_usecase"] = usecase_name
+    state["has_current_analysis"] = True
+
+
+def trim(state, max_messages=MAX_HISTORY_MESSAGES, keep=KEEP_MESSAGES):
+    """Archive the oldest follow-up turns once the history exceeds max_messages
+
+    The initial analysis is always kept and what follows it starts with a
+    user message, so the follow-up request still alternates user/assistant.
+    Returns the number of archived messages.
+    """
+    history = state["conversation_history"]
+    if len(history) <= max_messages:
+        return 0
+    cut = max(1, len(history) - keep)
+    while cut < len(history) and history[cut]["role"] != "user":
+        cut += 1
+    archived = history[1:cut]
+    review_store.update_draft(state["session_id"], state["current_usecase"], archived=archived)
+    del history[1:cut]
+    state["archived_turns"] += len(archived)
+    return len(archived)
+
+
+def select(state, usecase_name):
+    """Park the conversation of the previous use case and restore the selected one's"""
+    current = state.get("current_usecase")
+    if current == usecase_name:
+        return
+    # Results for the previous use case would be dropped; stop paying for them
+    scope = state.get("llm_scope")
+    if scope is not None:
+        scope.cancel()
+    if _has_conversation(state):
+        review_store.update_draft(
+            state["session_id"], current, history=state["conversation_history"],
+            prompt=state["analysis_prompt"] or "", meta=state["analysis_meta"],
+            usage=state.get("analysis_usage") or {}, structured=state.get("current_structured")
+        )
+        state["parked_usecases"].add(current)
+    # Everything a saved review is built from belongs to the selected use case only
+    state["conversation_history"] = []
+    state["analysis_prompt"] = None
+    state["analysis_meta"] = {}
+    state.pop("analysis_usage", None)
+    state.pop("current_structured", None)
+    state["archived_turns"] = 0
+    state["has_current_analysis"] = False
+    state["current_usecase"] = usecase_name
+
+    if usecase_name in state["parked_usecases"]:
+        state["parked_usecases"].discard(usecase_name)
+        draft = review_store.load_draft(state["session_id"], usecase_name)
+        if draft.get("history"):
+            state["conversation_history"] = draft["history"]
+            state["analysis_prompt"] = draft.get("prompt") or None
+            state["analysis_meta"] = draft.get("meta") or {}
+            if draft.get("usage"):
+                state["analysis_usage"] = draft["usage"]
+            if draft.get("structured"):
+                state["current_structured"] = draft["structured"]
+            state["archived_turns"] = len(draft.get("archived", ()))
+            state["has_current_analysis"] = True
+
+
+def llm_scope(state):
+    """Cancel scope for the LLM calls of the current use case"""
+    scope = state.get("llm_scope")
+    if scope is None or scope.cancelled or scope.label != state.get("current_usecase"):
+        if scope is not None:
+            scope.cancel()
+        scope = state["llm_scope"] = llm_client.CancelScope(state.get("current_usecase"))
+    return scope
+
+
+def full_history(state):
+    """The whole conversation, including turns archived to the draft store"""
+    history = state["conversation_history"]
+    if not state["archived_turns"] or not history:
+        return list(history)
+    archived = review_store.load_draft(state["session_id"], state["current_usecase"]).get("archived", [])
+    return history[:1] + archived + history[1:]
+
+
+def finish(state, usecase_name):
+    """Drop a saved conversation from memory and from the draft store"""
+    if state["archived_turns"] or usecase_name in state["parked_usecases"]:
+        review_store.delete_draft(state["session_id"], usecase_name)
+        state["parked_usecases"].discard(usecase_name)
+    state["conversation_history"] = []
+    state["analysis_prompt"] = None
+    state["archived_turns"] = 0
+    state["has_current_analysis"] = False
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by obj and the containers/strings it references"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def memory_stats(state):
+    """Per-key approximate sizes of this session's state, largest first, plus totals"""
+    seen = set()
+    sizes = {}
+    for key in list(state.keys()):
+        try:
+            sizes[key] = deep_size(state[key], seen)
+        except (KeyError, AttributeError):
+            continue
+    return {
+        "keys": dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True)),
+        "total_bytes": sum(sizes.values()),
+        "history_messages": len(state.get("conversation_history", ())),
+        "archived_turns": state.get("archived_turns", 0),
+        "parked_usecases": len(state.get("parked_usecases", ()))
+    }
+
+
+def format_memory_stats(stats, top=8):
+    lines = [
+        f"session state  {stats['total_bytes'] / 1024:8.1f} KB",
+        f"history        {stats['history_messages']} messages in memory, "
+        f"{stats['archived_turns']} archived",
+        f"parked         {stats['parked_usecases']} use cases"
+    ]
+    for key, size in list(stats["keys"].items())[:top]:
+        lines.append(f"  {key:<28} {size / 1024:8.1f} KB")
+    return "\n".join(lines)
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Catalog-wide SPL linter - cheap structural checks without the LLM
+
+Checks every use case for problems that need no model to find: missing
+files (the prompt would fall back to placeholder text), empty or unknown
+techniques, unterminated quotes/macros and unbalanced brackets, $token$
+placeholders nothing will substitute, and indexes outside the known list
+(SPL_KNOWN_INDEXES or --indexes, fnmatch patterns; the check is off when
+no list is given).
+
+Use cases are linted on a process pool; each worker loads the catalog
+itself, so only names and findings cross process boundaries. Results are
+written to a report (findings per use case, keyed by a fingerprint of the
+use case so unchanged ones are reused on the next run) and a small index
+(fingerprints, counts per use case and rule, use cases not worth an LLM
+review, and a review order). The app and API read the index; the report is
+only loaded once a use case with findings is looked at. GET /usecases?order=lint
+lists use cases in review order without the skipped ones.
+
+    python spl_lint.py --workers 8
+"""
+
+import os
+import re
+import time
+import fnmatch
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import serializers
+from catalog import DEFAULT_CATALOG_PATH, content_hash, get_catalog
+
+LINT_VERSION = 1  # bump when rules change so stored findings are recomputed
+REPORT_PATH = "spl_lint_report.json"
+INDEX_PATH = "spl_lint_index.json"
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+SEVERITIES = (ERROR, WARNING, INFO)
+
+# rule -> (severity, description)
+RULES = {
+    "missing-search": (ERROR, "search.spl is missing or empty"),
+    "missing-drilldown": (WARNING, "drilldown.spl is missing; the prompt says no drill down query is available"),
+    "missing-readme": (INFO, "README.md is missing"),
+    "no-techniques": (ERROR, "the use case maps to no ATT&CK techniques"),
+    "bad-technique-id": (ERROR, "technique ID is not of the form T1234 or T1234.001"),
+    "unknown-technique": (WARNING, "technique has no name or description in the catalog"),
+    "unbalanced": (ERROR, "unterminated quote, macro or comment, or unbalanced brackets"),
+    "search-token": (WARNING, "$token$ placeholder in search.spl that no saved search substitutes"),
+    "drilldown-token": (WARNING, "drilldown $token$ that is not a field of the search"),
+    "unknown-index": (WARNING, "index not in the known index list"),
+    "no-index": (INFO, "search does not name an index and runs over the default indexes"),
+}
+# An LLM review of these use cases has nothing meaningful to look at
+BLOCKING_RULES = ("missing-search", "no-techniques")
+
+TECHNIQUE_ID_RE = re.compile(r"^T\d{4}(?:\.\d{3})?$")
+DELIMITER_RE = re.compile(r'```|\\.|["`()\[\]]', re.DOTALL)
+PAIRS = {")": "(", "]": "["}
+TOKEN_RE = re.compile(r"\$([A-Za-z_][\w.:-]*)\$")
+# Tokens Splunk fills in itself
+BUILTIN_TOKEN_RE = re.compile(r"^(?:env:|job\.|click\.|form\.|earliest$|latest$|info_(?:min|max)_time$)")
+FIELD_PREFIX_RE = re.compile(r"^(?:result|row)\.")
+INDEX_RE = re.compile(r"\bindex\s*=\s*\"?([\w*.:-]+)\"?|\bindex\s+IN\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+def known_indexes_from_env():
+    return tuple(p.strip().lower() for p in os.getenv("SPL_KNOWN_INDEXES", "").split(",") if p.strip())
+
+
+def lint_key(entry):
+    """Fingerprint of everything the rules look at"""
+    digest = hashlib.sha1(content_hash(entry).encode("ascii"))
+    digest.update(",".join(entry.get("techniques", ())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def settings_key(known_indexes):
+    return f"{LINT_VERSION}:" + ",".join(sorted(known_indexes))
+
+
+def _line(text, pos):
+    return text.count("\n", 0, pos) + 1
+
+
+def finding(rule, message, file="", line=0):
+    return {"rule": rule, "severity": RULES[rule][0], "file": file, "line": line, "message": message}
+
+
+def check_delimiters(text, filename):
+    """Unterminated quotes/macros/comments and unbalanced brackets outside them"""
+    findings = []
+    stack = []
+    state, opened = None, 0
+    for match in DELIMITER_RE.finditer(text):
+        token = match.group()
+        if token.startswith("\\"):
+            continue
+        if state is not None:
+            if token == state:
+                state = None
+            continue
+        if token in ('"', "`", "```"):
+            state, opened = token, match.start()
+        elif token in "([":
+            stack.append((token, match.start()))
+        elif stack and stack[-1][0] == PAIRS[token]:
+            stack.pop()
+        else:
+            findings.append(finding("unbalanced", f"unmatched '{token}'", filename, _line(text, match.start())))
+    if state is not None:
+        kind = {'"': "quote", "`": "macro", "```": "comment"}[state]
+        findings.append(finding("unbalanced", f"unterminated {kind}", filename, _line(text, opened)))
+    findings.extend(finding("unbalanced", f"unclosed '{token}'", filename, _line(text, pos)) for token, pos in stack)
+    return findings
+
+
+def check_tokens(search, drilldown):
+    findings = []
+    seen = set()
+    for match in TOKEN_RE.finditer(search):
+        name = match.group(1)
+        if name not in seen and not BUILTIN_TOKEN_RE.match(name):
+            seen.add(name)
+            findings.append(finding("search-token", f"${name}$ is never substituted", "search.spl", _line(search, match.start())))
+    seen = set()
+    for match in TOKEN_RE.finditer(drilldown):
+        name = match.group(1)
+        field = FIELD_PREFIX_RE.sub("", name)
+        if name in seen or BUILTIN_TOKEN_RE.match(name):
+            continue
+        seen.add(name)
+        if not re.search(rf"\b{re.escape(field)}\b", search):
+            findings.append(finding(
+                "drilldown-token", f"${name}$ does not appear in the search", "drilldown.spl", _line(drilldown, match.start())
+            ))
+    return findings
+
+
+def check_indexes(search, known_indexes):
+    findings = []
+    named = False
+    for match in INDEX_RE.finditer(search):
+        named = True
+        values = [match.group(1)] if match.group(1) else re.split(r"[\s,]+", match.group(2))
+        for value in values:
+            value = value.strip("\"'").lower()
+            if not value or not known_indexes:
+                continue
+            if not any(fnmatch.fnmatchcase(value, pattern) for pattern in known_indexes):
+                findings.append(finding("unknown-index", f"index {value!r} is not known", "search.spl", _line(search, match.start())))
+    # Generating commands (| tstats, | inputlookup, ...) pick their own data
+    if not named and not search.lstrip().startswith("|"):
+        findings.append(finding("no-index", "no index= in the search", "search.spl"))
+    return findings
+
+
+def lint_usecase(entry, technique_table=None, known_indexes=()):
+    """Findings for one use case (see RULES)"""
+    files = entry.get("files", {})
+    search = files.get("search.spl") or ""
+    drilldown = files.get("drilldown.spl") or ""
+    findings = []
+
+    if not search.strip():
+        findings.append(finding("missing-search", "search.spl is missing", "search.spl"))
+    if not drilldown.strip():
+        findings.append(finding("missing-drilldown", "drilldown.spl is missing", "drilldown.spl"))
+    if not (files.get("README.md") or "").strip():
+        findings.append(finding("missing-readme", "README.md is missing", "README.md"))
+
+    technique_ids = entry.get("techniques", ())
+    if not technique_ids:
+        findings.append(finding("no-techniques", "no techniques"))
+    for technique_id in technique_ids:
+        if not TECHNIQUE_ID_RE.match(technique_id):
+            findings.append(finding("bad-technique-id", f"{technique_id!r} is not an ATT&CK ID"))
+        elif technique_table is not None:
+            technique = technique_table.get(technique_id)
+            if technique is None or not technique.name:
+                findings.append(finding("unknown-technique", f"{technique_id} is not described in the catalog"))
+
+    for filename, text in (("search.spl", search), ("drilldown.spl", drilldown)):
+        findings.extend(check_delimiters(text, filename))
+    findings.extend(check_tokens(search, drilldown))
+    if search.strip():
+        findings.extend(check_indexes(search, known_indexes))
+    return findings
+
+
+_worker = {}
+
+
+def _init_worker(catalog_path, known_indexes):
+    _worker["catalog"] = get_catalog(catalog_path)
+    _worker["known_indexes"] = known_indexes
+
+
+def _lint_names(names):
+    table, usecases = _worker["catalog"]
+    return [
+        (name, lint_key(usecases[name]), lint_usecase(usecases[name], table, _worker["known_indexes"]))
+        for name in names
+    ]
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def load_report(path=REPORT_PATH):
+    try:
+        return serializers.load_file(path)
+    except FileNotFoundError:
+        return {}
+
+
+def run_lint(catalog_path=DEFAULT_CATALOG_PATH, known_indexes=(), workers=None, previous=None):
+    """Lint the whole catalog; returns (report, number of use cases linted this run)
+
+    Use cases whose fingerprint matches `previous` (a loaded report with the
+    same rule version and settings) keep their stored findings.
+    """
+    table, usecases = get_catalog(catalog_path)
+    settings = settings_key(known_indexes)
+    stored = {}
+    if previous and previous.get("settings") == settings:
+        stored = previous.get("usecases", {})
+
+    results = {}
+    pending = []
+    for name, entry in usecases.items():
+        record = stored.get(name)
+        if record is not None and record.get("key") == lint_key(entry):
+            results[name] = record
+        else:
+            pending.append(name)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) < 2 * workers:
+        _init_worker(catalog_path, known_indexes)
+        batches = [_lint_names(pending)]
+    else:
+        # Small chunks keep the workers evenly loaded; names are all that is sent
+        size = max(1, len(pending) // (workers * 8))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(catalog_path, known_indexes)) as pool:
+            batches = list(pool.map(_lint_names, _chunks(pending, size)))
+    for batch in batches:
+        for name, key, findings in batch:
+            results[name] = {"key": key, "findings": findings}
+
+    report = {
+        "lint_version": LINT_VERSION,
+        "settings": settings,
+        "known_indexes": list(known_indexes),
+        "catalog": os.path.abspath(catalog_path),
+        "generated": datetime.now().isoformat(),
+        "usecases": dict(sorted(results.items()))
+    }
+    return report, len(pending)
+
+
+def build_index(report):
+    """Compact summary of a report: counts per use case and rule, skip list and review order"""
+    counts = {}
+    by_rule = {rule: [] for rule in RULES}
+    skip = []
+    for name, record in report["usecases"].items():
+        severities = [0] * len(SEVERITIES)
+        rules = set()
+        for item in record["findings"]:
+            severities[SEVERITIES.index(item["severity"])] += 1
+            rules.add(item["rule"])
+        for rule in rules:
+            by_rule[rule].append(name)
+        if severities != [0] * len(SEVERITIES):
+            counts[name] = severities
+        if rules.intersection(BLOCKING_RULES):
+            skip.append(name)
+    skipped = set(skip)
+    # Structural problems usually mean detection gaps too, so those use cases go first
+    order = sorted(
+        (name for name in report["usecases"] if name not in skipped),
+        key=lambda name: tuple(-n for n in counts.get(name, (0, 0, 0)))
+    )
+    return {
+        "generated": report["generated"],
+        "settings": report["settings"],
+        "known_indexes": report.get("known_indexes", []),
+        "keys": {name: record["key"] for name, record in report["usecases"].items()},
+        "severities": list(SEVERITIES),
+        "totals": {
+            severity: sum(c[i] for c in counts.values()) for i, severity in enumerate(SEVERITIES)
+        },
+        "counts": counts,
+        "by_rule": {rule: names for rule, names in by_rule.items() if names},
+        "skip": skip,
+        "review_order": order
+    }
+
+
+_snapshots = {}
+
+
+def _snapshot(path):
+    """Decoded JSON file shared by all sessions of the process, re-read only when it changes"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _snapshots.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _snapshots[path] = (mtime, serializers.load_file(path))
+    return cached[1]
+
+
+def lint_index(path=INDEX_PATH):
+    """The index written by the last run, or None"""
+    return _snapshot(path)
+
+
+def findings_for(name, entry, technique_table=None, index_path=INDEX_PATH, report_path=REPORT_PATH):
+    """Stored findings for a use case, or fresh ones when the index is missing or outdated
+
+    The index tells whether the stored findings are current and whether
+    there are any; the report is only read for use cases that have some.
+    Outdated use cases are linted with the index list of that run (which may
+    have come from --indexes), falling back to SPL_KNOWN_INDEXES.
+    """
+    index = lint_index(index_path)
+    known_indexes = known_indexes_from_env()
+    if index is not None and "known_indexes" in index:
+        known_indexes = tuple(index["known_indexes"])
+    if index is not None and index.get("settings") == settings_key(known_indexes) \
+            and index.get("keys", {}).get(name) == lint_key(entry):
+        if name not in index["counts"]:
+            return []
+        report = _snapshot(report_path) or {}
+        record = report.get("usecases", {}).get(name)
+        if record is not None and record.get("key") == lint_key(entry):
+            return record["findings"]
+    return lint_usecase(entry, technique_table, known_indexes)
+
+
+def review_order(names, index):
+    """names without the use cases not worth an LLM review, most findings first
+
+    Use cases the index does not know yet (added since the last run) follow
+    in their original order.
+    """
+    skip = set(index["skip"])
+    rank = {name: position for position, name in enumerate(index["review_order"])}
+    unranked = len(rank)
+    return sorted((name for name in names if name not in skip), key=lambda name: rank.get(name, unranked))
+
+
+def format_counts(counts):
+    """"1 error, 2 warnings" from a {severity: count} mapping"""
+    parts = [f"{n} {severity}{'s' if n != 1 else ''}" for severity, n in counts.items() if n]
+    return ", ".join(parts) or "no findings"
+
+
+def summarize(findings):
+    return format_counts({
+        severity: sum(1 for item in findings if item["severity"] == severity) for severity in SEVERITIES
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lint every use case's SPL without the LLM")
+    parser.add_argument("--catalog", default=os.getenv("USECASE_CATALOG", DEFAULT_CATALOG_PATH))
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--indexes", help="File with one known index (or fnmatch pattern) per line")
+    parser.add_argument("--report", default=REPORT_PATH, help="Findings report to write")
+    parser.add_argument("--index", default=INDEX_PATH, help="Summary index to write")
+    parser.add_argument("--full", action="store_true", help="Re-lint use cases whose stored findings are current")
+    args = parser.parse_args()
+
+    known_indexes = known_indexes_from_env()
+    if args.indexes:
+        with open(args.indexes, encoding="utf-8") as f:
+            known_indexes = tuple(line.strip().lower() for line in f if line.strip() and not line.startswith("#"))
+
+    start = time.perf_counter()
+    previous = None if args.full else load_report(args.report)
+    report, linted = run_lint(args.catalog, known_indexes, args.workers, previous)
+    index = build_index(report)
+    serializers.dump_file(args.report, report, pretty=True)
+    serializers.dump_file(args.index, index)
+    wall = time.perf_counter() - start
+
+    total = len(report["usecases"])
+    print(f"✅ Linted {linted} of {total} use cases in {wall:.2f}s ({total - linted} unchanged)")
+    print(f"   {format_counts(index['totals'])}; "
+          f"{len(index['skip'])} not worth an LLM review")
+    if not known_indexes:
+        print("   Index check off: set SPL_KNOWN_INDEXES or pass --indexes")
+    for rule, names in index["by_rule"].items():
+        print(f"   {rule:<18}{len(names):>6}")
+    print(f"   Report: {args.report}, index: {args.index}")
+
+
+if __name__ == "__main__":
+    main()
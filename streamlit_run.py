@@ -1,328 +1,452 @@
 import os
-import json
+import math
+import time
 import streamlit as st
-import requests
-from datetime import datetime
 
-# Load environment variables from .env file if it exists
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass  # dotenv not installed, use system environment variables
+import perf
+import prefix_reuse
+import prompts
+import structured_output
+import fanout
+import generation_policy
+import llm_client
+import review_store
+import rereview
+import session_manager
+import spl_lint
+import usecase_index
+import wire
+import serializers
+import catalog
+from catalog import TechniqueTable, get_catalog
+
+rerun_start = time.perf_counter()
+# Spans of this rerun (USECASE_PROFILE=1); None when profiling is off
+trace = perf.start_trace()
+LLM_POLL_INTERVAL = 0.5
 
 # Set page config for wider layout
 st.set_page_config(page_title="Usecase Review Assistant", layout="wide")
 
-def init_databricks_config():
-    """Initialize Databricks configuration for HTTP requests"""
-    token = os.getenv("DATABRICKS_TOKEN")
-    host = os.getenv("DATABRICKS_HOST")
-    
-    if not token or not host:
-        st.error("Missing DATABRICKS_TOKEN or DATABRICKS_HOST environment variables")
-        return None
-    
-    return {
-        "token": token,
-        "host": host.rstrip('/'),
-        "headers": {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-    }
-
-def call_databricks_llm(config, messages, temperature=0.1, max_tokens=2048):
-    """Call Databricks LLM using direct HTTP requests"""
-    if not config:
-        return None
-    
-    url = f"{config['host']}/serving-endpoints/databricks-meta-llama-3-3-70b-instruct/invocations"
-    
-    payload = {
-        "messages": messages,
-        "max_tokens": max_tokens,
-        "temperature": temperature
-    }
-    
+def new_usage():
+    return {"model": "", "prompt_tokens": 0, "completion_tokens": 0, "latency_ms": 0.0, "llm_calls": 0}
+
+def record_usage(result, latency_ms=None):
+    usage = st.session_state.setdefault("analysis_usage", new_usage())
+    usage["model"] = result.model
+    usage["prompt_tokens"] += result.prompt_tokens
+    usage["completion_tokens"] += result.completion_tokens
+    usage["latency_ms"] = round(usage["latency_ms"] + (result.latency_ms if latency_ms is None else latency_ms), 1)
+    usage["llm_calls"] += 1
+
+def waiting_indicator():
+    """Placeholder plus a tick() that updates it
+
+    Every update is a point where Streamlit can stop this run, so a reviewer
+    navigating away interrupts the wait instead of blocking until the reply.
+    """
+    status = st.empty()
+    start = time.monotonic()
+    def tick():
+        status.caption(f"Waiting for the endpoint... {time.monotonic() - start:.0f}s")
+    return status, tick
+
+def await_request(handle):
+    """Wait for a request handle; cancels it if this run is interrupted"""
+    status, tick = waiting_indicator()
     try:
-        response = requests.post(url, headers=config["headers"], json=payload, timeout=60)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            if 'choices' in response_json:
-                return response_json['choices'][0]['message']['content']
-            elif 'predictions' in response_json:
-                return str(response_json['predictions'][0])
-            else:
-                return str(response_json)
-        else:
-            st.error(f"API call failed with status {response.status_code}: {response.text}")
+        with perf.span("llm request", "llm"):
+            while not handle.wait(LLM_POLL_INTERVAL) and not handle.expired:
+                tick()
+            return handle.result()
+    finally:
+        if not handle.done():
+            handle.cancel()
+        status.empty()
+
+def llm_complete(messages, **params):
+    """Call Databricks LLM and record usage for the current analysis; raises LLMError"""
+    scope = session_manager.llm_scope(st.session_state)
+    handle = scope.submit(llm_client.get_config(), messages, **params)
+    result = await_request(handle)
+    record_usage(result)
+    return result
+
+def call_databricks_llm(messages, task, technique_count=1, question=""):
+    """Call Databricks LLM with limits sized for the task, reporting failures in the page"""
+    try:
+        return generation_policy.run(llm_complete, messages, task, technique_count, question).content
+    except llm_client.LLMError as e:
+        st.error(str(e))
+        return None
+
+@perf.traced("analysis")
+def run_analysis(selected, user_prompt):
+    """Run the main analysis in free-form or structured mode; returns markdown or None"""
+    st.session_state.analysis_usage = new_usage()
+    st.session_state.current_structured = None
+    structured = st.session_state.get("structured_mode", False)
+    entry = data[selected]
+    techniques = technique_table.resolve(entry.get("techniques", ()))
+
+    if st.session_state.get("fanout_mode") and len(techniques) > 1:
+        config = llm_client.get_config()
+        scope = session_manager.llm_scope(st.session_state)
+        # Worker threads have no Streamlit context; usage is recorded afterwards
+        def complete(messages, **params):
+            return scope.complete(config, messages, **params)
+        status, tick = waiting_indicator()
+        try:
+            with perf.span("llm fan-out", "llm"):
+                markdown, document, calls, wall_ms = fanout.run_fanout_analysis(
+                    complete, techniques, entry, structured, on_wait=tick
+                )
+        except llm_client.LLMError as e:
+            st.error(str(e))
             return None
-            
-    except Exception as e:
-        st.error(f"API request failed: {e}")
+        finally:
+            # Requests still pending belong to an interrupted run
+            if scope.pending():
+                scope.cancel()
+            status.empty()
+        for idx, result in enumerate(calls):
+            record_usage(result, latency_ms=wall_ms if idx == 0 else 0.0)
+        if document and document["failed"]:
+            st.warning(f"No valid structured result for {', '.join(document['failed'])} after retries")
+        st.session_state.current_structured = document
+        return markdown
+
+    if not structured:
+        return call_databricks_llm(
+            prompts.build_analysis_messages(user_prompt), generation_policy.ANALYSIS, len(techniques)
+        )
+
+    try:
+        document, _ = structured_output.run_structured_analysis(llm_complete, techniques, entry, user_prompt)
+    except llm_client.LLMError as e:
+        st.error(str(e))
         return None
+    if document["failed"]:
+        st.warning(f"No valid structured result for {', '.join(document['failed'])} after retries")
+    st.session_state.current_structured = document
+    return structured_output.render_markdown(document, techniques)
 
-config = init_databricks_config()
+@perf.traced("re-review")
+def run_rereview(selected):
+    """Re-review only what changed since the saved analysis; returns (markdown, prompt, base version) or None"""
+    st.session_state.analysis_usage = new_usage()
+    st.session_state.current_structured = None
+    record = review_store.load_analysis(selected)
+    entry = data[selected]
+    techniques = technique_table.resolve(entry.get("techniques", ()))
+    try:
+        markdown, prompt, _ = rereview.run_rereview(llm_complete, techniques, entry, record)
+    except ValueError as e:
+        st.info(str(e))
+        return None
+    except llm_client.LLMError as e:
+        st.error(str(e))
+        return None
+    return markdown, prompt, record.get("version", 1)
 
-@st.cache_data
-def load_data(path="mitre_enriched_with_files.json"):
+@perf.traced("data load")
+def load_data(path=os.getenv("USECASE_CATALOG", "mitre_enriched_with_files.json")):
+    """Shared catalog for this process; loaded on first use only"""
     try:
-        with open(path, encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return get_catalog(path)
+    except (FileNotFoundError,) + serializers.decode_errors() as e:
         st.error(f"Error loading data: {e}")
-        return {}
+        return TechniqueTable(), {}
 
-data = load_data()
+technique_table, data = load_data()
 
 st.title("Usecase Review Assistant")
 
-# Load and save reviewed usecases to persistent file
-def load_reviewed_usecases():
-    try:
-        with open("reviewed_usecases.json", "r") as f:
-            return set(json.load(f))
-    except FileNotFoundError:
-        return set()
-
-def save_reviewed_usecases(reviewed_set):
-    with open("reviewed_usecases.json", "w") as f:
-        json.dump(list(reviewed_set), f)
+HISTORY_TAIL = 6
+PAGE_SIZES = (50, 100, 250)
 
-def save_analysis(usecase_name, analysis_text):
-    """Save analysis result to JSON file with usecase name as key"""
+def save_analysis(usecase_name, analysis_text, content_hash="", metadata=None, snapshot=None):
+    """Save analysis result, reporting failures in the page; returns the saved version or None"""
     try:
-        # Load existing analyses
-        try:
-            with open("usecase_analyses.json", "r") as f:
-                analyses = json.load(f)
-        except FileNotFoundError:
-            analyses = {}
-        
-        # Add new analysis
-        analyses[usecase_name] = {
-            "analysis": analysis_text,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Save back to file
-        with open("usecase_analyses.json", "w") as f:
-            json.dump(analyses, f, indent=2)
-            
+        return review_store.save_analysis(usecase_name, analysis_text, content_hash, metadata, snapshot)
     except Exception as e:
         st.error(f"Error saving analysis: {e}")
+        return None
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def default_prompt_for(usecase_name, files_hash, technique_ids):
+    """Default prompt per use case, built once per process instead of every rerun
+
+    files_hash and technique_ids key the cache on the use case's content, so
+    a reloaded catalog with edited SPL or README gets a fresh prompt.
+    """
+    entry = data[usecase_name]
+    return prompts.build_default_prompt(technique_table.resolve(technique_ids), entry)
+
+@st.fragment
+@perf.traced("analysis panel")
+def analysis_panel(selected):
+    """Main LLM analysis; only redrawn on full reruns"""
+    st.subheader("LLM Analysis")
+    meta = st.session_state.analysis_meta
+    if meta.get("mode") == "rereview" and st.session_state.analysis_prompt:
+        st.caption(f"Re-review of version {meta['base_version']}: only the changes since then were sent")
+        with st.expander("Re-review prompt"):
+            st.code(st.session_state.analysis_prompt, language="markdown")
+    if st.session_state.conversation_history:
+        st.write(st.session_state.conversation_history[0]["content"])
 
-# Initialize reviewed usecases in session state
-if 'reviewed_usecases' not in st.session_state:
-    st.session_state.reviewed_usecases = load_reviewed_usecases()
+def queue_followup():
+    follow_up_question = st.session_state.get("followup_input", "")
+    if follow_up_question.strip():
+        st.session_state.pending_followup = follow_up_question
+    # Clear the box so the next question starts empty
+    st.session_state.followup_input = ""
 
-usecases = list(data.keys())
-if not usecases:
+@st.fragment
+@perf.traced("follow-up panel")
+def followup_panel(selected):
+    """Follow-up chat; typing and answering rerun only this fragment"""
+    history = st.session_state.conversation_history
+
+    # Process any pending follow-up question before drawing the conversation
+    question = st.session_state.get("pending_followup")
+    if question:
+        st.session_state.pending_followup = None
+        history.append({"role": "user", "content": question})
+        with st.spinner("Getting response..."):
+            follow_up_result = call_databricks_llm(
+                prompts.build_followup_messages(history, st.session_state.analysis_prompt),
+                generation_policy.FOLLOWUP,
+                question=question
+            )
+        if follow_up_result:
+            history.append({"role": "assistant", "content": follow_up_result})
+            # Keep long chats bounded; the oldest turns move to the draft store
+            session_manager.trim(st.session_state)
+        else:
+            st.error("Follow-up request failed")
+
+    # Show follow-up conversation using chat interface
+    if len(history) > 1:  # More than just the initial response
+        st.subheader("Follow-up Conversation")
+        turns = history[1:]
+        older, recent = turns[:-HISTORY_TAIL], turns[-HISTORY_TAIL:]
+        archived = st.session_state.archived_turns
+        if older or archived:
+            # One collapsed element for older turns keeps redraws flat as chats grow
+            with st.expander(f"Earlier messages ({len(older) + archived})"):
+                if archived:
+                    st.caption(f"{archived} older messages are archived and included when saving.")
+                st.markdown(prompts.format_conversation(older))
+        for msg in recent:
+            with st.chat_message(msg["role"]):
+                st.write(msg["content"])
+
+    st.subheader("Ask Follow-up Question")
+    st.text_input(
+        "Type your follow-up question and press Enter:",
+        key="followup_input",
+        on_change=queue_followup,
+        placeholder="Ask a follow-up question..."
+    )
+
+@st.fragment
+@perf.traced("review panel")
+def review_panel(selected):
+    """Final review notes and save; typing reruns only this fragment"""
+    st.subheader("Final Review")
+    final_review = st.text_area("Add your final review/notes:", height=100, placeholder="Enter your final thoughts, conclusions, or additional notes about this use case...")
+
+    # Save Analysis button below Final Review
+    if st.button("Save Analysis"):
+        # Save the full conversation, not just initial analysis
+        full_conversation = prompts.format_conversation(session_manager.full_history(st.session_state), final_review)
+        metadata = dict(st.session_state.get("analysis_usage") or {})
+        metadata.update(st.session_state.analysis_meta)
+        if st.session_state.get("current_structured"):
+            metadata["structured"] = st.session_state.current_structured
+        entry = data[selected]
+        version = save_analysis(selected, full_conversation, catalog.content_hash(entry), metadata, rereview.snapshot(entry))
+        if version:
+            # Mark this usecase as reviewed
+            # Merge with marks other sessions saved meanwhile
+            review_store.mark_reviewed(selected)
+            st.session_state.flash = f"✅ Analysis saved as version {version} and use case '{selected}' marked as reviewed!"
+            # Clear the current analysis after saving; the selector labels change too
+            session_manager.finish(st.session_state, selected)
+            st.rerun()
+
+@perf.traced("lint panel")
+def lint_panel(selected):
+    """Local SPL lint findings, from the last spl_lint.py run when it is current"""
+    findings = spl_lint.findings_for(selected, data[selected], technique_table)
+    if not findings:
+        return
+    blocking = [item for item in findings if item["rule"] in spl_lint.BLOCKING_RULES]
+    if blocking:
+        st.warning("An LLM review has little to work with: " + "; ".join(item["message"] for item in blocking))
+    with st.expander(f"Lint findings ({spl_lint.summarize(findings)})"):
+        for item in findings:
+            location = f"{item['file']}:{item['line']}" if item["line"] else item["file"]
+            st.markdown(f"- **{item['severity']}** `{item['rule']}` {location} {item['message']}")
+
+# Conversation state is bounded; the reviewed set is shared by all sessions
+session_manager.init(st.session_state)
+
+if st.session_state.get("flash"):
+    st.success(st.session_state.pop("flash"))
+
+@perf.traced("options building")
+def usecase_browser(index, reviewed, review_hashes):
+    """Filterable, paginated use case selector; returns the selected use case name"""
+    counts = index.counts(reviewed, review_hashes)
+    filter_col, search_col, size_col = st.columns([3, 3, 1])
+    status = filter_col.radio(
+        "Show:",
+        usecase_index.STATUS_FILTERS,
+        format_func=lambda s: f"{s.title()} ({counts[s]})",
+        horizontal=True,
+        key="usecase_filter"
+    )
+    query = search_col.text_input("Search use cases:", key="usecase_query")
+    page_size = size_col.selectbox("Per page:", PAGE_SIZES, key="usecase_page_size")
+
+    # Filtering is O(catalog); reuse the last result while its inputs are unchanged.
+    # The snapshots are kept and compared by identity: ids of freed objects get reused
+    inputs = (index, reviewed, review_hashes)
+    cached = st.session_state.get("usecase_filter_cache")
+    if cached and cached[0] == (status, query) and all(a is b for a, b in zip(cached[1], inputs)):
+        names = cached[2]
+    else:
+        names = index.filter(status, reviewed, review_hashes, query)
+        st.session_state.usecase_filter_cache = ((status, query), inputs, names)
+
+    if not names:
+        st.info("No use cases match the current filter.")
+        return None
+
+    page_count = math.ceil(len(names) / page_size)
+    if st.session_state.get("usecase_page", 1) > page_count:
+        st.session_state.usecase_page = page_count
+    page = st.number_input(
+        f"Page (of {page_count}, {len(names)} use cases):",
+        min_value=1,
+        max_value=page_count,
+        step=1,
+        key="usecase_page"
+    )
+    page_names, _ = usecase_index.paginate(names, page, page_size)
+
+    # Options are the stable names; markers only live in the labels
+    return st.selectbox(
+        "Select a Use Case:",
+        page_names,
+        format_func=lambda name: index.label(name, reviewed, review_hashes),
+        key="usecase_selected"
+    )
+
+if not data:
     st.warning("No use cases found.")
 else:
-    # Format usecase names to show reviewed status
-    usecase_options = []
-    for usecase in usecases:
-        if usecase in st.session_state.reviewed_usecases:
-            usecase_options.append(f"✅ {usecase}")
-        else:
-            usecase_options.append(usecase)
-    
-    selected_display = st.selectbox("Select a Use Case:", usecase_options)
-    # Extract the actual usecase name (remove the ✅ prefix if present)
-    selected = selected_display.replace("✅ ", "")
+    with perf.span("review state", "disk"):
+        index = usecase_index.get_index(data)
+        review_hashes = review_store.load_review_hashes()
+        reviewed = review_store.reviewed_snapshot()
+    selected = usecase_browser(index, reviewed, review_hashes)
 
     if selected:
-        tech = data[selected]
-        files = tech.get("files", {})
-        spl_query = files.get("search.spl") or "No SPL available"
-        drilldown_query = files.get("drilldown.spl") or "No drill down query available"
-        readme = files.get("README.md") or "No README available"
-
-        techniques = tech.get("techniques", [])
-        if not techniques:
+        with perf.span("session select"):
+            session_manager.select(st.session_state, selected)
+        lint_panel(selected)
+        if not data[selected].get("techniques"):
             st.error("No technique data available.")
         else:
-            techniques_info = ""
-            for idx, t in enumerate(techniques, 1):
-                techniques_info += (
-                    f"### Technique {idx}\n"
-                    f"ID: {t.get('ID','')}\n"
-                    f"Name: {t.get('name','')}\n"
-                    f"Description: {t.get('description','')}\n"
-                    f"Tactics: {t.get('tactics','')}\n"
-                    f"Platforms: {t.get('platforms','')}\n\n"
+            st.subheader("Custom Prompt")
+            with perf.span("prompt assembly"):
+                entry = data[selected]
+                default_prompt = default_prompt_for(
+                    selected, catalog.content_hash(entry), tuple(entry.get("techniques", ()))
                 )
+            user_prompt = st.text_area(
+                "Edit the prompt to LLM:",
+                value=default_prompt,
+                height=400,
+                help="The review instructions are sent separately as a system message shared by every request"
+            )
 
-            files_info = (
-                f"### SPL Query\n{spl_query}\n\n"
-                f"### Drill-down SPL Query\n{drilldown_query}\n\n"
-                f"### README Context\n{readme}\n\n"
+            st.checkbox(
+                "Structured output (JSON per technique)",
+                key="structured_mode",
+                help="Request a machine-readable result; invalid techniques are retried individually"
             )
 
-            default_prompt = (
-                "You are a security-focused assistant. "
-                "Review the following SPL against each MITRE technique and describe any coverage gaps.\n\n"
-                f"{techniques_info}"
-                f"{files_info}"
-                "Please analyze and for each technique:\n"
-                "1. What is not covered by the SPL query for detecting this technique?\n"
-                "2. Identify any mistakes or gaps.\n"
-                "3. Suggest specific changes needed.\n"
-                "4. Provide recommendations for improving detection coverage."
+            st.checkbox(
+                "Fan out per technique (parallel requests)",
+                key="fanout_mode",
+                help="One request per technique using the default per-technique prompt; results are merged"
             )
 
-            st.subheader("Custom Prompt")
-            user_prompt = st.text_area("Edit the prompt to LLM:", value=default_prompt, height=400)
+            # A reviewed use case whose SPL/README changed can be re-reviewed from the diff
+            saved_hash = review_hashes.get(selected)
+            stale = bool(saved_hash) and saved_hash != index.content_hash(selected)
+            analyze_col, rereview_col = st.columns(2)
+            analyze_clicked = analyze_col.button("Analyze Use Case")
+            rereview_clicked = stale and rereview_col.button(
+                "Re-review Changes",
+                help="Send only the SPL/README diff since the saved analysis plus its findings"
+            )
 
-            if st.button("Analyze Use Case"):
-                if not config:
-                    st.error("Databricks configuration not initialized. Please check your environment variables.")
+            if analyze_clicked or rereview_clicked:
+                if not llm_client.get_config():
+                    st.error("Missing DATABRICKS_TOKEN or DATABRICKS_HOST environment variables")
                 else:
                     with st.spinner("Analyzing..."):
-                        messages = [
-                            {
-                                "role": "system", 
-                                "content": (
-                                    "You are a security-focused assistant. "
-                                    "Review the provided SPL and drill-down SPL queries against the MITRE ATT&CK techniques."
-                                )
-                            },
-                            {"role": "user", "content": user_prompt}
-                        ]
-                        
                         st.write("Making API call...")
-                        analysis_result = call_databricks_llm(config, messages, temperature=0.1, max_tokens=2048)
-                        
-                        if analysis_result:
-                            # Store the analysis result in session state FIRST
-                            if 'conversation_history' not in st.session_state:
-                                st.session_state.conversation_history = []
-                            
-                            # Mark that we have a current analysis
-                            st.session_state.has_current_analysis = True
-                            st.session_state.current_usecase = selected
-                            
-                            # Only add to conversation if it's not already there (prevent duplicates)
-                            if not st.session_state.conversation_history or st.session_state.conversation_history[-1]["content"] != analysis_result:
-                                st.session_state.conversation_history = [{
-                                    "role": "assistant",
-                                    "content": analysis_result
-                                }]
-                            
-                            st.session_state.current_analysis = {
-                                "usecase": selected,
-                                "analysis": analysis_result
-                            }
-            
+                        if rereview_clicked:
+                            outcome = run_rereview(selected)
+                            if outcome:
+                                markdown, prompt, base_version = outcome
+                                session_manager.start(
+                                    st.session_state, selected, markdown, prompt,
+                                    {"mode": "rereview", "base_version": base_version}
+                                )
+                        else:
+                            analysis_result = run_analysis(selected, user_prompt)
+
+                            if analysis_result:
+                                # Mark that we have a current analysis
+                                session_manager.start(st.session_state, selected, analysis_result, user_prompt)
+
             # Show analysis and follow-up section if we have a current analysis
             if st.session_state.get('has_current_analysis', False) and st.session_state.get('current_usecase') == selected:
-                # Display the main analysis
-                st.subheader("LLM Analysis")
-                if st.session_state.conversation_history:
-                    st.write(st.session_state.conversation_history[0]["content"])
-                
-                # Show follow-up conversation using chat interface
-                if len(st.session_state.conversation_history) > 1:  # More than just the initial response
-                    st.subheader("Follow-up Conversation")
-                    
-                    # Display conversation in chat format
-                    for msg in st.session_state.conversation_history[1:]:  # Skip the first response
-                        with st.chat_message(msg["role"]):
-                            st.write(msg["content"])
-                
-                # Chat input for follow-up questions
-                st.subheader("Ask Follow-up Question")
-                
-                # Initialize pending question state
-                if 'pending_followup' not in st.session_state:
-                    st.session_state.pending_followup = None
-                
-                # Process any pending follow-up question
-                if st.session_state.pending_followup:
-                    question = st.session_state.pending_followup
-                    st.session_state.pending_followup = None  # Clear it
-                    
-                    # Add user question to conversation
-                    st.session_state.conversation_history.append({
-                        "role": "user",
-                        "content": question
-                    })
-                    
-                    # Get LLM response
-                    with st.spinner("Getting response..."):
-                        try:
-                            # Build properly formatted message history
-                            system_msg = {
-                                "role": "system", 
-                                "content": (
-                                    "You are a security-focused assistant. "
-                                    "Review the provided SPL and drill-down SPL queries against the MITRE ATT&CK techniques. "
-                                    f"Original analysis: {st.session_state.conversation_history[0]['content']}"
-                                )
-                            }
-                            
-                            # Only include user/assistant pairs, skip the initial assistant message
-                            follow_up_messages = [system_msg]
-                            for msg in st.session_state.conversation_history[1:]:  # Skip first assistant message
-                                follow_up_messages.append(msg)
-                            
-                            follow_up_result = call_databricks_llm(
-                                config, 
-                                follow_up_messages, 
-                                temperature=0.1, 
-                                max_tokens=2048
-                            )
-                            
-                            if follow_up_result:
-                                # Add assistant response to conversation
-                                st.session_state.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": follow_up_result
-                                })
-                                st.rerun()
-                            else:
-                                st.error("Follow-up request failed")
-                            
-                        except Exception as e:
-                            st.error(f"Follow-up error: {e}")
-                
-                # Chat input - store question in session state instead of processing immediately
-                def handle_followup():
-                    follow_up_question = st.session_state.get("followup_input", "")
-                    if follow_up_question.strip():
-                        st.session_state.pending_followup = follow_up_question
-                        st.rerun()
-                
-                st.text_input(
-                    "Type your follow-up question and press Enter:",
-                    key="followup_input",
-                    on_change=handle_followup,
-                    placeholder="Ask a follow-up question..."
-                )
-                
-                # Final review section
-                st.subheader("Final Review")
-                final_review = st.text_area("Add your final review/notes:", height=100, placeholder="Enter your final thoughts, conclusions, or additional notes about this use case...")
-                
-                # Save Analysis button below Final Review
-                if st.button("Save Analysis"):
-                    # Save the full conversation, not just initial analysis
-                    full_conversation = "\n\n".join([
-                        f"**{msg['role'].title()}:** {msg['content']}" 
-                        for msg in st.session_state.conversation_history
-                    ])
-                    
-                    # Add final review if provided
-                    if final_review.strip():
-                        full_conversation += f"\n\n**Final Review:**\n{final_review}"
-                    
-                    save_analysis(selected, full_conversation)
-                    # Mark this usecase as reviewed
-                    st.session_state.reviewed_usecases.add(selected)
-                    save_reviewed_usecases(st.session_state.reviewed_usecases)
-                    st.success(f"✅ Analysis saved and use case '{selected}' marked as reviewed!")
-                    # Clear the current analysis after saving
-                    st.session_state.has_current_analysis = False
+                analysis_panel(selected)
+                followup_panel(selected)
+                review_panel(selected)
+
+# Opt-in startup/rerun profile (USECASE_PROFILE=1)
+if os.getenv("USECASE_PROFILE"):
+    if trace is not None:
+        # The debug sidebar itself is not part of the measured rerun
+        trace.finish()
+        perf.write_trace(trace)
+        with st.sidebar.expander("Rerun waterfall"):
+            st.code(perf.format_waterfall(trace))
+            st.download_button(
+                "Download trace", serializers.dumps(perf.chrome_trace(trace)),
+                file_name="rerun-trace.json", mime="application/json",
+                help="Chrome trace event format; open in chrome://tracing or ui.perfetto.dev"
+            )
+        with st.sidebar.expander("Span timings (recent reruns)"):
+            st.code(perf.format_span_stats(perf.span_stats()))
+    with st.sidebar.expander("Startup profile"):
+        st.code(perf.format_startup_report())
+        st.write(f"This rerun: {(time.perf_counter() - rerun_start) * 1000:.1f} ms")
+    with st.sidebar.expander("Prompt prefix reuse"):
+        st.code(prefix_reuse.format_stats(prefix_reuse.get_tracker().stats()))
+    with st.sidebar.expander("Bytes on the wire"):
+        st.code(wire.format_stats(wire.get_meter().stats()))
+    with st.sidebar.expander("Generation limits"):
+        st.code(generation_policy.format_stats(generation_policy.get_policy()))
+    with st.sidebar.expander("Session memory"):
+        st.code(session_manager.format_memory_stats(session_manager.memory_stats(st.session_state)))
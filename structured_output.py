@@ -0,0 +1,169 @@
+"""
+Structured JSON output mode for use case analyses
+
+Asks the endpoint for a JSON document following ANALYSIS_SCHEMA, validates
+it locally and re-requests only the techniques whose part was missing or
+malformed. The merged result is machine-readable and can be rendered back
+to the usual markdown for display and saving.
+"""
+
+import re
+
+import prompts
+import serializers
+import generation_policy
+
+FIELDS = ("uncovered_behaviors", "mistakes", "suggested_spl_changes", "recommendations")
+FIELD_TITLES = {
+    "uncovered_behaviors": "Not covered by the SPL query",
+    "mistakes": "Mistakes or gaps",
+    "suggested_spl_changes": "Suggested SPL changes",
+    "recommendations": "Recommendations"
+}
+MAX_RETRIES = 2
+CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+TECHNIQUE_SCHEMA = {
+    "type": "object",
+    "properties": dict(
+        {"technique_id": {"type": "string"}},
+        **{field: {"type": "array", "items": {"type": "string"}} for field in FIELDS}
+    ),
+    "required": ["technique_id"] + list(FIELDS),
+    "additionalProperties": False
+}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {"techniques": {"type": "array", "items": TECHNIQUE_SCHEMA}},
+    "required": ["techniques"],
+    "additionalProperties": False
+}
+
+
+def response_format():
+    """OpenAI-style response_format accepted by Databricks serving endpoints"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "usecase_review", "schema": ANALYSIS_SCHEMA, "strict": True}
+    }
+
+
+def json_instructions(technique_ids):
+    return (
+        "\n\nRespond ONLY with a JSON object of the form "
+        '{"techniques": [{"technique_id": "...", "uncovered_behaviors": ["..."], '
+        '"mistakes": ["..."], "suggested_spl_changes": ["..."], "recommendations": ["..."]}]} '
+        f"with exactly one entry for each of these technique IDs: {', '.join(technique_ids)}. "
+        "Use an empty list where there is nothing to report."
+    )
+
+
+def parse_reply(text):
+    """Decode a reply that should be JSON, tolerating markdown code fences"""
+    try:
+        return serializers.loads(CODE_FENCE_RE.sub("", text.strip()))
+    except serializers.decode_errors():
+        return None
+
+
+def validate_technique(item):
+    """Return an error string for a malformed technique entry, or None"""
+    if not isinstance(item, dict):
+        return "entry is not an object"
+    if not isinstance(item.get("technique_id"), str):
+        return "technique_id missing"
+    for field in FIELDS:
+        values = item.get(field)
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            return f"{field} must be a list of strings"
+    return None
+
+
+def validate_analysis(document, technique_ids):
+    """Split a decoded reply into (valid entries by ID, errors by ID)
+
+    Techniques that are absent or malformed get an error entry; unexpected
+    technique IDs are ignored.
+    """
+    valid = {}
+    errors = {}
+    items = document.get("techniques") if isinstance(document, dict) else None
+    if not isinstance(items, list):
+        return valid, {tid: "reply is not a techniques document" for tid in technique_ids}
+
+    wanted = set(technique_ids)
+    for item in items:
+        error = validate_technique(item)
+        technique_id = item.get("technique_id") if isinstance(item, dict) else None
+        if technique_id not in wanted or technique_id in valid:
+            continue
+        if error:
+            errors[technique_id] = error
+        else:
+            errors.pop(technique_id, None)
+            valid[technique_id] = {"technique_id": technique_id, **{f: item[f] for f in FIELDS}}
+
+    for technique_id in technique_ids:
+        if technique_id not in valid and technique_id not in errors:
+            errors[technique_id] = "technique missing from reply"
+    return valid, errors
+
+
+def retry_prompt(techniques, entry, failed_ids):
+    """Focused prompt covering only the techniques that failed validation"""
+    failed = [t for t in techniques if t.ID in failed_ids]
+    return prompts.build_default_prompt(failed, entry) + json_instructions([t.ID for t in failed])
+
+
+def run_structured_analysis(complete, techniques, entry, user_prompt, max_retries=MAX_RETRIES):
+    """Run a structured analysis, retrying only failed techniques
+
+    `complete(messages, **params)` must return an LLMResult; generation
+    limits come from generation_policy.
+    Returns (result document, list of LLMResults for usage accounting).
+    """
+    technique_ids = [t.ID for t in techniques]
+    calls = []
+    merged = {}
+
+    prompt = user_prompt + json_instructions(technique_ids)
+    pending = list(technique_ids)
+    for _ in range(max_retries + 1):
+        result = generation_policy.run(
+            complete, prompts.build_analysis_messages(prompt), generation_policy.STRUCTURED, len(pending),
+            response_format=response_format()
+        )
+        calls.append(result)
+        valid, errors = validate_analysis(parse_reply(result.content), pending)
+        merged.update(valid)
+        pending = [tid for tid in pending if tid in errors]
+        if not pending:
+            break
+        prompt = retry_prompt(techniques, entry, set(pending))
+
+    document = {
+        "techniques": [merged[tid] for tid in technique_ids if tid in merged],
+        "failed": pending
+    }
+    return document, calls
+
+
+def render_markdown(document, techniques=()):
+    """Render a structured result in the same shape as the free-form analysis"""
+    names = {t.ID: t.name for t in techniques}
+    sections = []
+    for idx, item in enumerate(document.get("techniques", []), 1):
+        technique_id = item["technique_id"]
+        title = f"### Technique {idx}: {technique_id}"
+        if names.get(technique_id):
+            title += f" {names[technique_id]}"
+        lines = [title]
+        for number, field in enumerate(FIELDS, 1):
+            lines.append(f"{number}. **{FIELD_TITLES[field]}:**")
+            values = item.get(field) or ["None"]
+            lines.extend(f"   - {value}" for value in values)
+        sections.append("\n".join(lines))
+    if document.get("failed"):
+        sections.append(f"_No valid structured result for: {', '.join(document['failed'])}_")
+    return "\n\n".join(sections)
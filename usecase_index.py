@@ -0,0 +1,116 @@
+"""
+Precomputed use case index backing the paginated selector
+
+Use case names (the catalog keys) are the stable IDs; display labels with
+review markers are derived separately and never parsed back into names.
+"""
+
+import math
+import threading
+
+from catalog import content_hash
+
+ALL = "all"
+UNREVIEWED = "unreviewed"
+REVIEWED = "reviewed"
+STALE = "stale"
+STATUS_FILTERS = (ALL, UNREVIEWED, REVIEWED, STALE)
+
+STATUS_MARKERS = {REVIEWED: "✅ ", STALE: "⚠️ ", UNREVIEWED: ""}
+
+
+class UseCaseIndex:
+    """Sorted names plus lazily computed content hashes for one loaded catalog"""
+
+    def __init__(self, usecases):
+        self._usecases = usecases
+        self.names = sorted(usecases)
+        self._name_set = frozenset(self.names)
+        self._lowered = [name.lower() for name in self.names]
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._name_set
+
+    def content_hash(self, name):
+        # Only reviewed use cases are ever hashed, so this stays small
+        digest = self._hashes.get(name)
+        if digest is None:
+            digest = content_hash(self._usecases[name])
+            with self._lock:
+                self._hashes[name] = digest
+        return digest
+
+    def status(self, name, reviewed, review_hashes):
+        if name not in reviewed:
+            return UNREVIEWED
+        saved_hash = review_hashes.get(name)
+        # Reviews saved before hashes were recorded cannot be judged stale
+        if saved_hash and saved_hash != self.content_hash(name):
+            return STALE
+        return REVIEWED
+
+    def label(self, name, reviewed, review_hashes):
+        return STATUS_MARKERS[self.status(name, reviewed, review_hashes)] + name
+
+    def stale_names(self, reviewed, review_hashes):
+        return {
+            name for name in reviewed
+            if name in self._name_set and self.status(name, reviewed, review_hashes) == STALE
+        }
+
+    def counts(self, reviewed, review_hashes):
+        """Number of use cases per status filter"""
+        reviewed_count = sum(1 for name in reviewed if name in self._name_set)
+        stale_count = len(self.stale_names(reviewed, review_hashes))
+        return {
+            ALL: len(self.names),
+            UNREVIEWED: len(self.names) - reviewed_count,
+            REVIEWED: reviewed_count - stale_count,
+            STALE: stale_count
+        }
+
+    def filter(self, status, reviewed, review_hashes, query=""):
+        """Names matching a status filter and a case-insensitive substring query"""
+        query = query.strip().lower()
+        if status in (REVIEWED, STALE):
+            stale = self.stale_names(reviewed, review_hashes)
+            wanted = stale if status == STALE else {n for n in reviewed if n in self._name_set} - stale
+            names = sorted(wanted)
+            if query:
+                names = [name for name in names if query in name.lower()]
+            return names
+
+        if not query and status == ALL:
+            return self.names
+        return [
+            name for name, lowered in zip(self.names, self._lowered)
+            if (not query or query in lowered) and (status == ALL or name not in reviewed)
+        ]
+
+
+def paginate(items, page, page_size):
+    """Return (items on the 1-based page, total page count)"""
+    page_count = max(1, math.ceil(len(items) / page_size))
+    page = min(max(1, page), page_count)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], page_count
+
+
+_index_lock = threading.Lock()
+_index_cache = (None, None)
+
+
+def get_index(usecases):
+    """Process-wide index for the currently loaded catalog, rebuilt only when it reloads"""
+    global _index_cache
+    if _index_cache[0] is usecases:
+        return _index_cache[1]
+    with _index_lock:
+        if _index_cache[0] is not usecases:
+            _index_cache = (usecases, UseCaseIndex(usecases))
+    return _index_cache[1]
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Request payload minimization and bytes-on-the-wire accounting
+
+Reviewers often work over a slow VPN link, and each follow-up resends the
+whole conversation. llm_client therefore sends smaller requests:
+
+- context blocks are normalized when the prompt is built: trailing
+  whitespace and blank-line runs dropped, plus HTML comments, images/badges
+  and closing heading hashes removed from README markdown
+- blocks that repeat text sent earlier in the same request (an SPL query
+  quoted back in a reply, a pasted drilldown) are replaced by a short
+  reference; earlier messages are never changed, so the prompt prefix
+  stays stable for prefix caching (see prefix_reuse.py)
+- bodies are compact UTF-8 JSON; with LLM_REQUEST_COMPRESSION=gzip those
+  above COMPRESS_MIN_BYTES are gzip-compressed (Content-Encoding). Not every
+  serving endpoint accepts that, so it is off by default, and an endpoint
+  that rejects a compressed body gets uncompressed ones from then on
+
+Each call's sent and received bytes are recorded on its LLMResult and in a
+process-wide meter. The CLI estimates the savings for a batch run.
+"""
+
+import os
+import re
+import gzip
+import argparse
+import threading
+
+import serializers
+
+MINIMIZE = os.getenv("LLM_PAYLOAD_MINIMIZE", "1") != "0"
+COMPRESSION = os.getenv("LLM_REQUEST_COMPRESSION", "none")  # none | gzip
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 6
+MIN_DEDUP_CHARS = 160
+REPEATED_MARKER = "[Repeated text omitted: identical to content sent earlier in this conversation]"
+
+TRAILING_WS_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+BLANK_RUN_RE = re.compile(r"\n{3,}")
+HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+CLOSED_HEADING_RE = re.compile(r"^(#{1,6} .*?)[ \t]+#+[ \t]*$", re.MULTILINE)
+FENCE_RE = re.compile(r"^\s*```")
+HEADING_RE = re.compile(r"^#{1,6} ")
+
+_lock = threading.Lock()
+# Endpoint hosts that rejected compressed bodies
+_uncompressed_hosts = set()
+_meter = None
+
+
+def normalize_whitespace(text):
+    """Text without trailing spaces, CRLFs or runs of blank lines"""
+    text = TRAILING_WS_RE.sub("", text.replace("\r\n", "\n"))
+    return BLANK_RUN_RE.sub("\n\n", text).strip()
+
+
+def normalize_markdown(text):
+    """README markdown without comments, images/badges and closing heading hashes"""
+    text = HTML_COMMENT_RE.sub("", text)
+    text = IMAGE_RE.sub("", text)
+    return normalize_whitespace(CLOSED_HEADING_RE.sub(r"\1", text))
+
+
+def _blocks(text):
+    """Paragraphs of a message, keeping fenced code blocks whole"""
+    blocks = []
+    current = []
+    fenced = False
+    for line in text.split("\n"):
+        if FENCE_RE.match(line):
+            fenced = not fenced
+        if not fenced and not line.strip():
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _block_key(block):
+    """Block content without fences or a leading heading, whitespace collapsed"""
+    lines = [line for line in block.split("\n") if not FENCE_RE.match(line)]
+    if lines and HEADING_RE.match(lines[0]):
+        lines = lines[1:]
+    return " ".join(" ".join(lines).split())
+
+
+def dedupe_messages(messages, min_chars=MIN_DEDUP_CHARS):
+    """Replace blocks already sent earlier in the request with REPEATED_MARKER
+
+    System messages and the first occurrence of any block are left as they
+    are; a message's result depends only on the messages before it.
+    """
+    seen = set()
+    result = []
+    for message in messages:
+        blocks = _blocks(message["content"])
+        keys = [_block_key(block) for block in blocks]
+        if message["role"] != "system":
+            replaced = [
+                REPEATED_MARKER if len(key) >= min_chars and key in seen else block
+                for block, key in zip(blocks, keys)
+            ]
+            if replaced != blocks:
+                message = dict(message, content="\n\n".join(replaced))
+        seen.update(key for key in keys if len(key) >= min_chars)
+        result.append(message)
+    return result
+
+
+def minimize_messages(messages):
+    """Whitespace-normalized, deduplicated copy of a request's messages"""
+    if not MINIMIZE:
+        return messages
+    return dedupe_messages([dict(m, content=normalize_whitespace(m["content"])) for m in messages])
+
+
+def encode_body(payload, host="", compression=COMPRESSION):
+    """(body bytes, extra request headers, uncompressed size), gzip-compressed where worthwhile"""
+    body = serializers.dumps(payload)
+    if compression != "gzip" or len(body) < COMPRESS_MIN_BYTES or host in _uncompressed_hosts:
+        return body, {}, len(body)
+    return gzip.compress(body, COMPRESS_LEVEL), {"Content-Encoding": "gzip"}, len(body)
+
+
+def decode_body(body, headers=None):
+    """Payload from an encoded body (for cassettes and mock endpoints)"""
+    if (headers or {}).get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return serializers.loads(body)
+
+
+def reject_compression(host):
+    """Remember that an endpoint host does not accept compressed bodies"""
+    with _lock:
+        _uncompressed_hosts.add(host)
+
+
+class WireMeter:
+    """Request/response byte totals: JSON as built, after minimization, sent and received"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {"calls": 0, "original": 0, "minimized": 0, "sent": 0, "received": 0}
+
+    def record(self, original, minimized, sent, received):
+        with self._lock:
+            self._totals["calls"] += 1
+            self._totals["original"] += original
+            self._totals["minimized"] += minimized
+            self._totals["sent"] += sent
+            self._totals["received"] += received
+
+    def stats(self):
+        with self._lock:
+            return dict(self._totals)
+
+
+def format_stats(stats):
+    calls = stats["calls"] or 1
+    lines = [f"{stats['calls']} calls, per call:"]
+    for label, key in (("request JSON", "original"), ("minimized", "minimized"), ("sent", "sent"),
+                       ("received", "received")):
+        share = f"{stats[key] / stats['original']:>6.0%}" if stats["original"] and key != "received" else ""
+        lines.append(f"  {label:<14}{stats[key] / calls / 1024:>9.1f} KB {share}")
+    return "\n".join(lines)
+
+
+def get_meter():
+    """Process-wide meter fed by llm_client"""
+    global _meter
+    if _meter is None:
+        with _lock:
+            if _meter is None:
+                _meter = WireMeter()
+    return _meter
+
+
+def simulate_batch(technique_table, usecases, limit, followups=3):
+    """Request sizes of a batch run's analyses and follow-ups: {"raw", "minimized", "gzip"} byte totals"""
+    import json
+
+    import prompts
+
+    totals = {"requests": 0, "raw": 0, "minimized": 0, "gzip": 0}
+    for name in sorted(usecases)[:limit]:
+        entry = usecases[name]
+        techniques = technique_table.resolve(entry.get("techniques", ()))
+        if not techniques:
+            continue
+        prompt = prompts.build_default_prompt(techniques, entry)
+        spl = prompts.usecase_files(entry)[0]
+        # Replies and questions commonly quote the SPL back
+        reply = f"The search below misses several behaviours.\n\n```spl\n{spl}\n```\n\nAdd the missing fields."
+        history = [{"role": "assistant", "content": reply}]
+        requests = [prompts.build_analysis_messages(prompt)]
+        for turn in range(followups):
+            history.append({"role": "user", "content": f"Question {turn}: is this still right?\n\n{spl}"})
+            requests.append(prompts.build_followup_messages(history, prompt))
+            history.append({"role": "assistant", "content": reply})
+        for messages in requests:
+            raw = json.dumps({"messages": messages, "max_tokens": 1024, "temperature": 0.1}).encode("utf-8")
+            body, _, size = encode_body(
+                {"messages": minimize_messages(messages), "max_tokens": 1024, "temperature": 0.1}, compression="none"
+            )
+            totals["requests"] += 1
+            totals["raw"] += len(raw)
+            totals["minimized"] += size
+            totals["gzip"] += len(gzip.compress(body, COMPRESS_LEVEL))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate request bytes saved by payload minimization")
+    parser.add_argument("--catalog", default="mitre_enriched_with_files.json", help="Catalog to replay")
+    parser.add_argument("--limit", type=int, default=200, help="Number of use cases")
+    parser.add_argument("--followups", type=int, default=3, help="Follow-up turns per use case")
+    args = parser.parse_args()
+
+    from catalog import load_catalog
+
+    technique_table, usecases = load_catalog(args.catalog)
+    totals = simulate_batch(technique_table, usecases, args.limit, args.followups)
+    raw = totals["raw"] or 1
+    print(f"{totals['requests']} requests (analysis + {args.followups} follow-ups per use case)\n")
+    print(f"{'body':<22}{'total':>12}{'per request':>14}{'share':>8}")
+    for label, key in (("plain JSON", "raw"), ("minimized", "minimized"), ("minimized + gzip", "gzip")):
+        per_request = totals[key] / max(1, totals["requests"]) / 1024
+        print(f"{label:<22}{totals[key] / 1024:>10.1f}KB{per_request:>12.1f}KB{totals[key] / raw:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()